@@ -6,16 +6,24 @@ Configuration and constants for EduParser application
 APP_TITLE = "EduParser"
 APP_ICON = "🎓"
 APP_LAYOUT = "wide"
+PREVIEW_THUMBNAIL_SIZE = 512  # Long-edge pixel cap for upload previews
 
 # Page Names
 PAGE_DOCUMENT_PARSER = "Document Parser"
 PAGE_SPREADSHEET_LOADER = "Spreadsheet Loader"
+PAGE_SCHOOL_STANDARDIZER = "School Standardizer"
 PAGE_EXPERIENCE_PARSER = "Experience Parser"
 PAGE_SETTINGS = "Settings"
 
 # Model Settings
 GROQ_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
 DEFAULT_TEMPERATURE = 0.05
+NAME_MATCH_MODEL = "llama-3.1-8b-instant"  # Name-to-name mapping needs no large model
+GROQ_REQUESTS_PER_MINUTE = 30  # Per-key rate limit on the free tier
+RATE_LIMIT_COOLDOWN_SECONDS = 60  # Used when a rate-limit error has no Retry-After header
+MAX_RETRY_WAIT_SECONDS = 30  # Cap on a single in-request retry wait
+DOCUMENT_BATCH_SIZE = 4  # Images per Groq Vision request
+IMAGE_MAX_DIMENSION = 1600  # Long-edge pixel cap for images sent to the vision model
 
 # Environment Variable Names
 ENV_API_KEY_PRIMARY = "GROQ_API_KEY"
@@ -26,9 +34,27 @@ ENV_API_KEY_3 = "GROQ_API_KEY_3"
 SESSION_API_KEYS = "groq_api_keys"
 SESSION_RESULTS = "results_df"
 SESSION_PROCESSED_FILES = "processed_files"
-SESSION_CV_RESULTS = "cv_results"
+SESSION_CV_SUMMARY = "cv_summary_df"
+SESSION_CV_DETAILED = "cv_detailed_df"
+SESSION_PERSON_NUMBER = "person_number"
 
 # OCR Settings
 OCR_DPI = 300
+OCR_DPI_STANDARD_PAGE = 200  # Enough for body text on Letter/A4-sized pages
+OCR_STANDARD_PAGE_AREA = 700 * 1000  # Page area (points^2) up to which OCR_DPI_STANDARD_PAGE is used
+OCR_TESSERACT_CONFIG = "--oem 1"  # LSTM engine only
 OCR_MIN_TEXT_LENGTH = 50
 OCR_LANGUAGE = 'eng'
+
+# PDF Settings
+PDF_STORE_MAX_BYTES = 256 * 1024 * 1024  # Shrink the PyMuPDF cache above this size
+
+# CV Settings
+CV_MIN_TEXT_PER_PAGE = 100  # Below this average, a CV is treated as image-only
+CV_VISION_MAX_PAGES = 5  # Pages sent to the vision model for image-only CVs
+CV_MAX_PAGE_CHARS = 6000  # Per-page text cap in section extraction prompts
+
+# Cache Settings
+CACHE_TTL_SECONDS = 3600
+CACHE_MAX_ENTRIES = 200
+RESPONSE_CACHE_MAX_ENTRIES = 2000  # Disk-persisted Groq responses
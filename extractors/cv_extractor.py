@@ -1,14 +1,227 @@
 """
 CV/Experience Extractor with Two-Pass Hybrid + OCR Approach
 """
-import json
-from config import GROQ_MODEL, DEFAULT_TEMPERATURE
-from utils.pdf_processor import extract_all_pages
+import base64
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from config import (
+    GROQ_MODEL, DEFAULT_TEMPERATURE, OCR_MIN_TEXT_LENGTH, RESPONSE_CACHE_MAX_ENTRIES,
+    CV_MIN_TEXT_PER_PAGE, CV_VISION_MAX_PAGES, CV_MAX_PAGE_CHARS
+)
+from utils.api_client import stream_completion_text
+from utils.llm_json import parse_llm_json_object
+from utils.pdf_processor import read_embedded_text, apply_ocr_fallback, render_pages_to_jpeg, shrink_pdf_store
+
+
+# Section prompt templates for PASS 2 (static; only the page text is filled in per call)
+CIF_EXPERIENCE_PROMPT = """Extract work experience from CIF Professional Information:
+
+{full_text}
+
+Return ONLY valid JSON:
+{{
+  "found": true/false,
+  "details": "Brief summary",
+  "experiences": [
+    {{
+      "employer": "Company",
+      "designation": "Title",
+      "date_joining": "DD/MM/YYYY",
+      "date_leaving": "DD/MM/YYYY or Present",
+      "duration_months": "Number",
+      "monthly_salary": "Amount",
+      "responsibilities": "Summary"
+    }}
+  ]
+}}
+
+found = true ONLY if actual work experience exists"""
+
+RESUME_EXPERIENCE_PROMPT = """Extract ALL work experience from Resume/CV:
+
+{full_text}
+
+Return ONLY valid JSON:
+{{
+  "found": true/false,
+  "details": "Brief summary",
+  "experiences": [
+    {{
+      "employer": "Company",
+      "designation": "Title",
+      "date_joining": "DD/MM/YYYY",
+      "date_leaving": "DD/MM/YYYY or Present",
+      "duration_months": "Number",
+      "monthly_salary": "Amount",
+      "responsibilities": "Summary"
+    }}
+  ]
+}}"""
+
+LETTER_EXPERIENCE_PROMPT = """Extract work experience from Experience Certificates/Letters:
+
+{full_text}
+
+Return ONLY valid JSON:
+{{
+  "found": true/false,
+  "details": "Company names",
+  "experiences": [
+    {{
+      "employer": "Company from letterhead",
+      "designation": "Title",
+      "date_joining": "DD/MM/YYYY",
+      "date_leaving": "DD/MM/YYYY",
+      "duration_months": "Number",
+      "monthly_salary": "Amount",
+      "responsibilities": "Brief"
+    }}
+  ]
+}}"""
+
+# Single-pass prompt for scanned CVs that have no usable text layer
+CV_VISION_PROMPT = """These images are the first pages of a scanned merged candidate document (CIF, Resume/CV and Experience Letters). Extract the candidate's personal information and ALL work experience.
+
+Return ONLY valid JSON:
+{
+  "personal_info": {
+    "full_name": "Extract candidate name",
+    "cnic": "Extract CNIC (format: 00000-0000000-0)",
+    "email": "Extract email",
+    "contact": "Extract phone"
+  },
+  "experience_in_cif": {"found": true/false, "details": "Brief summary"},
+  "experience_in_resume": {"found": true/false, "details": "Brief summary"},
+  "experience_letter_found": {"found": true/false, "details": "Company names"},
+  "experiences": [
+    {
+      "source": "CIF, Resume or Experience Letter",
+      "employer": "Company",
+      "designation": "Title",
+      "date_joining": "DD/MM/YYYY",
+      "date_leaving": "DD/MM/YYYY or Present",
+      "duration_months": "Number",
+      "monthly_salary": "Amount",
+      "responsibilities": "Summary"
+    }
+  ]
+}
+
+found = true ONLY if actual work experience exists in that section"""
+
+# PASS 1 structure prompt (used when the anchor phrases don't settle the page ranges)
+STRUCTURE_PROMPT = """Analyze this {total_pages}-page merged candidate document and identify which pages contain each section.
+
+SAMPLE PAGES:
+{sample_text}
+
+TASK: Identify page ranges for each section:
+1. CIF (Candidate Information Form) - "Professional Information", "Present Employer"
+2. Resume/CV - "Experience", "Skills", "Summary"
+3. Experience Letters - "EXPERIENCE CERTIFICATE", company letterheads
+
+Return ONLY valid JSON:
+{{
+  "cif_pages": [1, 2, 3],
+  "resume_pages": [4, 5, 6, 7],
+  "experience_letter_pages": [25, 26, 27]
+}}
+
+Rules:
+- Return empty array [] if section not found
+- CIF usually first 1-3 pages
+- Resume usually middle pages
+- Experience letters usually last pages"""
+
+# Personal information prompt (first pages of the document)
+PERSONAL_INFO_PROMPT = """Extract personal information:
+
+{first_pages_text}
+
+Return ONLY valid JSON:
+{{
+  "full_name": "Extract candidate name",
+  "cnic": "Extract CNIC (format: 00000-0000000-0)",
+  "email": "Extract email",
+  "contact": "Extract phone"
+}}"""
+
+# Section type -> (prompt template, max_tokens)
+SECTION_PROMPTS = {
+    "CIF": (CIF_EXPERIENCE_PROMPT, 3000),
+    "Resume": (RESUME_EXPERIENCE_PROMPT, 4000),
+    "Experience Letter": (LETTER_EXPERIENCE_PROMPT, 4000),
+}
+
+
+# Cached CV results are versioned on every prompt template
+CV_PROMPT_VERSION = hashlib.md5("".join((
+    STRUCTURE_PROMPT, PERSONAL_INFO_PROMPT, CIF_EXPERIENCE_PROMPT,
+    RESUME_EXPERIENCE_PROMPT, LETTER_EXPERIENCE_PROMPT, CV_VISION_PROMPT,
+)).encode("utf-8")).hexdigest()[:8]
+
+# Fallbacks used when a model response cannot be parsed
+UNKNOWN_PERSONAL_INFO = {"full_name": "Unknown", "cnic": "", "email": "", "contact": ""}
+SECTION_NOT_FOUND = {"found": False, "details": ""}
+
+
+class DegradedCVResult(Exception):
+    """
+    Raised out of the cached CV body when a model response could not be parsed.
+    Carries the result built with fallbacks, so the caller still gets it but it is never cached.
+    """
+    
+    def __init__(self, result: dict):
+        super().__init__("CV extracted with fallback values")
+        self.result = result
+
+
+# Section anchor phrases of the fixed CIF / CV / experience-letter templates.
+# Only template headings - generic phrases ("skills", "worked as") also occur in other sections
+SECTION_PATTERNS = (
+    ("cif_pages", re.compile(r"professional information|present employer|candidate information form", re.I)),
+    ("resume_pages", re.compile(r"curriculum vitae|professional summary", re.I)),
+    ("experience_letter_pages", re.compile(r"experience certificate|to whom it may concern", re.I)),
+)
+
+
+def classify_pages_by_keywords(pages_data: list):
+    """
+    Assign pages to sections by counting template anchor phrases on each page.
+    A page with no anchors continues the section of the page before it.
+    
+    Args:
+        pages_data: List of page dictionaries with 'page_num' and 'text'
+    
+    Returns:
+        dict: Page ranges for CIF, Resume, and Experience Letters, or None unless
+            the first page and every section have an anchor - an unanchored
+            section's pages would otherwise be folded into the section before it
+    """
+    structure = {section_key: [] for section_key, _ in SECTION_PATTERNS}
+    anchored_sections = set()
+    current_section = None
+    
+    for p in pages_data:
+        scores = [len(pattern.findall(p['text'])) for _, pattern in SECTION_PATTERNS]
+        best_score = max(scores)
+        if best_score > 0:
+            current_section = SECTION_PATTERNS[scores.index(best_score)][0]
+            anchored_sections.add(current_section)
+        if current_section is None:
+            return None
+        structure[current_section].append(p['page_num'])
+    
+    return structure if len(anchored_sections) == len(SECTION_PATTERNS) else None
 
 
 def discover_document_structure(client, pages_data: list, total_pages: int) -> dict:
     """
     PASS 1: Analyze document structure and identify page ranges for each section.
+    Pages are classified by template anchor phrases first; the AI is asked
+    unless the first page and every section carry an anchor phrase.
     
     Args:
         client: Groq client instance
@@ -17,7 +230,14 @@ def discover_document_structure(client, pages_data: list, total_pages: int) -> d
     
     Returns:
         dict: Page ranges for CIF, Resume, and Experience Letters
+    
+    Raises:
+        ValueError: If the model response contains no JSON object
     """
+    keyword_structure = classify_pages_by_keywords(pages_data)
+    if keyword_structure is not None:
+        return keyword_structure
+    
     # Create a sample of pages (first 3, middle 2, last 3)
     sample_pages = []
     
@@ -34,52 +254,29 @@ def discover_document_structure(client, pages_data: list, total_pages: int) -> d
         sample_pages.extend(pages_data[-3:])
     
     # Build sample text with page numbers
-    sample_text = ""
+    sample_parts = []
     for p in sample_pages:
-        sample_text += f"\n{'='*60}\nPAGE {p['page_num']} of {total_pages}\n{'='*60}\n"
-        sample_text += p['text'][:1000]  # First 1000 chars of each sample page
+        sample_parts.append(f"\n{'='*60}\nPAGE {p['page_num']} of {total_pages}\n{'='*60}\n")
+        sample_parts.append(p['text'][:1000])  # First 1000 chars of each sample page
+    sample_text = "".join(sample_parts)
     
     # AI: Analyze structure
-    structure_prompt = f"""Analyze this {total_pages}-page merged candidate document and identify which pages contain each section.
-
-SAMPLE PAGES:
-{sample_text}
+    structure_prompt = STRUCTURE_PROMPT.format(total_pages=total_pages, sample_text=sample_text)
 
-TASK: Identify page ranges for each section:
-1. CIF (Candidate Information Form) - "Professional Information", "Present Employer"
-2. Resume/CV - "Experience", "Skills", "Summary"
-3. Experience Letters - "EXPERIENCE CERTIFICATE", company letterheads
-
-Return ONLY valid JSON:
-{{
-  "cif_pages": [1, 2, 3],
-  "resume_pages": [4, 5, 6, 7],
-  "experience_letter_pages": [25, 26, 27]
-}}
+    # API errors propagate so the key fallback can retry them (and they are never cached)
+    response_text = stream_completion_text(
+        client,
+        model=GROQ_MODEL,
+        messages=[{"role": "user", "content": structure_prompt}],
+        temperature=DEFAULT_TEMPERATURE,
+        max_tokens=500
+    )
+    
+    return parse_llm_json_object(response_text)
 
-Rules:
-- Return empty array [] if section not found
-- CIF usually first 1-3 pages
-- Resume usually middle pages
-- Experience letters usually last pages"""
 
-    try:
-        response = client.chat.completions.create(
-            model=GROQ_MODEL,
-            messages=[{"role": "user", "content": structure_prompt}],
-            temperature=DEFAULT_TEMPERATURE,
-            max_tokens=500
-        )
-        
-        response_text = response.choices[0].message.content.strip()
-        start = response_text.find('{')
-        end = response_text.rfind('}') + 1
-        if start != -1 and end > start:
-            return json.loads(response_text[start:end])
-    except:
-        pass
-    
-    # Fallback structure
+def fallback_structure(total_pages: int) -> dict:
+    """Positional page ranges used when the structure response cannot be parsed."""
     return {
         "cif_pages": list(range(1, min(4, total_pages+1))),
         "resume_pages": list(range(4, total_pages-2)) if total_pages > 6 else [],
@@ -88,38 +285,20 @@ Rules:
 
 
 def extract_personal_info(client, pages_data: list) -> dict:
-    """Extract personal information from first few pages."""
+    """Extract personal information from first few pages (raises ValueError on an unparseable response)."""
     first_pages_text = '\n\n'.join([p['text'] for p in pages_data[:3]])
     
-    personal_prompt = f"""Extract personal information:
-
-{first_pages_text[:5000]}
+    personal_prompt = PERSONAL_INFO_PROMPT.format(first_pages_text=first_pages_text[:5000])
 
-Return ONLY valid JSON:
-{{
-  "full_name": "Extract candidate name",
-  "cnic": "Extract CNIC (format: 00000-0000000-0)",
-  "email": "Extract email",
-  "contact": "Extract phone"
-}}"""
-
-    try:
-        response = client.chat.completions.create(
-            model=GROQ_MODEL,
-            messages=[{"role": "user", "content": personal_prompt}],
-            temperature=DEFAULT_TEMPERATURE,
-            max_tokens=500
-        )
-        
-        response_text = response.choices[0].message.content.strip()
-        start = response_text.find('{')
-        end = response_text.rfind('}') + 1
-        if start != -1 and end > start:
-            return json.loads(response_text[start:end])
-    except:
-        pass
+    response_text = stream_completion_text(
+        client,
+        model=GROQ_MODEL,
+        messages=[{"role": "user", "content": personal_prompt}],
+        temperature=DEFAULT_TEMPERATURE,
+        max_tokens=500
+    )
     
-    return {"full_name": "Unknown", "cnic": "", "email": "", "contact": ""}
+    return parse_llm_json_object(response_text)
 
 
 def extract_section_experience(client, pages_data: list, page_nums: list, section_type: str) -> tuple:
@@ -134,115 +313,112 @@ def extract_section_experience(client, pages_data: list, page_nums: list, sectio
     
     Returns:
         tuple: (found_dict, experiences_list)
+    
+    Raises:
+        ValueError: If the model response is not the expected JSON object
     """
     if not page_nums:
-        return {"found": False, "details": ""}, []
+        return dict(SECTION_NOT_FOUND), []
     
-    # Filter pages
-    filtered_pages = [p for p in pages_data if p['page_num'] in page_nums]
+    # Filter pages (set lookup instead of scanning page_nums for every page)
+    page_num_set = set(page_nums)
+    filtered_pages = [p for p in pages_data if p['page_num'] in page_num_set]
     if not filtered_pages:
-        return {"found": False, "details": ""}, []
+        return dict(SECTION_NOT_FOUND), []
     
-    # Build full text
-    full_text = '\n\n'.join([f"PAGE {p['page_num']}:\n{p['text']}" for p in filtered_pages])
+    # Build full text (each page capped to bound the prompt size on pathological scans)
+    full_text = '\n\n'.join(
+        f"PAGE {p['page_num']}:\n{p['text'][:CV_MAX_PAGE_CHARS]}" for p in filtered_pages
+    )
     
-    # Section-specific prompts
-    if section_type == "CIF":
-        prompt = f"""Extract work experience from CIF Professional Information:
-
-{full_text}
+    # Section-specific prompt (unknown types are treated as Experience Letters)
+    prompt_template, max_tokens = SECTION_PROMPTS.get(section_type, SECTION_PROMPTS["Experience Letter"])
+    prompt = prompt_template.format(full_text=full_text)
+    
+    response_text = stream_completion_text(
+        client,
+        model=GROQ_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=DEFAULT_TEMPERATURE,
+        max_tokens=max_tokens
+    )
+    
+    data = parse_llm_json_object(response_text)
+    try:
+        found_info = {"found": data.get("found", False), "details": data.get("details", "")}
+        experiences = data.get("experiences", [])
+        
+        # Add source to each experience
+        for exp in experiences:
+            exp['source'] = section_type
+    except (AttributeError, TypeError) as e:
+        raise ValueError(f"Unexpected {section_type} response structure") from e
+    
+    return found_info, experiences
 
-Return ONLY valid JSON:
-{{
-  "found": true/false,
-  "details": "Brief summary",
-  "experiences": [
-    {{
-      "employer": "Company",
-      "designation": "Title",
-      "date_joining": "DD/MM/YYYY",
-      "date_leaving": "DD/MM/YYYY or Present",
-      "duration_months": "Number",
-      "monthly_salary": "Amount",
-      "responsibilities": "Summary"
-    }}
-  ]
-}}
 
-found = true ONLY if actual work experience exists"""
-        max_tokens = 3000
-        
-    elif section_type == "Resume":
-        prompt = f"""Extract ALL work experience from Resume/CV:
+def extract_cv_with_vision(client, pdf_bytes: bytes, total_pages: int) -> dict:
+    """
+    Extract personal info and experience from a scanned CV using the vision model.
+    Used when the PDF has no usable text, so the text passes would only see empty pages.
+    
+    Args:
+        client: Groq client instance
+        pdf_bytes: PDF file bytes
+        total_pages: Total number of pages
+    
+    Returns:
+        dict: Same result structure as process_cv_multipage (without OCR metadata)
+    
+    Raises:
+        ValueError: If the model response contains no JSON object
+    """
+    page_images = render_pages_to_jpeg(pdf_bytes, CV_VISION_MAX_PAGES)
+    
+    content = [{"type": "text", "text": CV_VISION_PROMPT}]
+    for image_bytes in page_images:
+        content.append({
+            "type": "image_url",
+            "image_url": {"url": f"data:image/jpeg;base64,{base64.b64encode(image_bytes).decode('ascii')}"}
+        })
+    
+    response_text = stream_completion_text(
+        client,
+        model=GROQ_MODEL,
+        messages=[{"role": "user", "content": content}],
+        temperature=DEFAULT_TEMPERATURE,
+        max_tokens=4000
+    )
+    
+    data = parse_llm_json_object(response_text)
+    return vision_result(data, len(page_images), total_pages)
 
-{full_text}
 
-Return ONLY valid JSON:
-{{
-  "found": true/false,
-  "details": "Brief summary",
-  "experiences": [
-    {{
-      "employer": "Company",
-      "designation": "Title",
-      "date_joining": "DD/MM/YYYY",
-      "date_leaving": "DD/MM/YYYY or Present",
-      "duration_months": "Number",
-      "monthly_salary": "Amount",
-      "responsibilities": "Summary"
-    }}
-  ]
-}}"""
-        max_tokens = 4000
-        
-    else:  # Experience Letter
-        prompt = f"""Extract work experience from Experience Certificates/Letters:
+def vision_result(data: dict, vision_page_count: int, total_pages: int) -> dict:
+    """Build the CV result from a parsed vision response ({} gives the fallback result)."""
+    return {
+        "personal_info": data.get("personal_info") or dict(UNKNOWN_PERSONAL_INFO),
+        "experience_in_cif": data.get("experience_in_cif") or dict(SECTION_NOT_FOUND),
+        "experience_in_resume": data.get("experience_in_resume") or dict(SECTION_NOT_FOUND),
+        "experience_letter_found": data.get("experience_letter_found") or dict(SECTION_NOT_FOUND),
+        "all_experiences": data.get("experiences") or [],
+        "structure": {
+            "cif_pages": [],
+            "resume_pages": [],
+            "experience_letter_pages": [],
+            "vision_pages": list(range(1, vision_page_count + 1)),
+            "total_pages": total_pages
+        }
+    }
 
-{full_text}
 
-Return ONLY valid JSON:
-{{
-  "found": true/false,
-  "details": "Company names",
-  "experiences": [
-    {{
-      "employer": "Company from letterhead",
-      "designation": "Title",
-      "date_joining": "DD/MM/YYYY",
-      "date_leaving": "DD/MM/YYYY",
-      "duration_months": "Number",
-      "monthly_salary": "Amount",
-      "responsibilities": "Brief"
-    }}
-  ]
-}}"""
-        max_tokens = 4000
-    
+def _result_or_fallback(future, fallback, parse_failures: list):
+    """Result of a submitted extraction; an unparseable response is recorded and replaced by the fallback."""
     try:
-        response = client.chat.completions.create(
-            model=GROQ_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=DEFAULT_TEMPERATURE,
-            max_tokens=max_tokens
-        )
-        
-        response_text = response.choices[0].message.content.strip()
-        start = response_text.find('{')
-        end = response_text.rfind('}') + 1
-        if start != -1 and end > start:
-            data = json.loads(response_text[start:end])
-            found_info = {"found": data.get("found", False), "details": data.get("details", "")}
-            experiences = data.get("experiences", [])
-            
-            # Add source to each experience
-            for exp in experiences:
-                exp['source'] = section_type
-            
-            return found_info, experiences
-    except:
-        pass
-    
-    return {"found": False, "details": ""}, []
+        return future.result()
+    except ValueError as e:
+        parse_failures.append(e)
+        return fallback
 
 
 def process_cv_multipage(client, pdf_file) -> dict:
@@ -252,6 +428,7 @@ def process_cv_multipage(client, pdf_file) -> dict:
     Pass 1: Document Structure Discovery (AI analyzes sample pages)
     Pass 2: Targeted Deep Extraction (3 focused AI calls)
     OCR: Automatic fallback for scanned/image pages
+    Vision: Scanned CVs with no usable text go to a single vision-model call instead
     
     Args:
         client: Groq client instance
@@ -260,39 +437,97 @@ def process_cv_multipage(client, pdf_file) -> dict:
     Returns:
         dict: Extracted personal info, experience data, metadata
     """
-    # Extract all pages with OCR
-    pages_data, ocr_used_pages = extract_all_pages(pdf_file)
-    total_pages = len(pages_data)
-    
-    # PASS 1: Discover document structure
-    structure = discover_document_structure(client, pages_data, total_pages)
+    pdf_bytes = pdf_file.getvalue()
+    pdf_hash = hashlib.sha256(pdf_bytes).hexdigest()
+    try:
+        return _process_cv_bytes(client, pdf_hash, pdf_bytes, CV_PROMPT_VERSION, GROQ_MODEL)
+    except DegradedCVResult as e:
+        # Returned to the caller, but not cached, so a re-upload tries the model again
+        return e.result
+
+
+@st.cache_data(persist="disk", max_entries=RESPONSE_CACHE_MAX_ENTRIES, show_spinner=False)
+def _process_cv_bytes(_client, pdf_hash: str, _pdf_bytes: bytes, prompt_version: str, model: str) -> dict:
+    """
+    Cached body of process_cv_multipage, keyed on the PDF hash, prompt version and model.
+    Persisted to disk so re-uploaded CVs skip every Groq call across reruns and restarts.
+    The client and raw bytes are excluded from the cache key (leading underscore).
+    Raises DegradedCVResult instead of returning when any response had to be replaced by
+    a fallback, so degraded results are never cached.
+    """
+    client, pdf_bytes = _client, _pdf_bytes
+    parse_failures = []
+    page_texts = read_embedded_text(pdf_bytes)
     
-    # Extract personal info
-    personal_info = extract_personal_info(client, pages_data)
+    # The personal-info call and the three Pass-2 section calls are independent
+    # HTTP round-trips, so they run concurrently on the same client
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        # Personal info only needs the first pages. When those already have embedded
+        # text (OCR leaves them unchanged), the call overlaps OCR of the remaining pages.
+        # OCR only ever adds text, so it is started early only when the embedded text
+        # alone rules out the image-only (vision) route - otherwise the call could be wasted
+        personal_future = None
+        embedded_text_length = sum(len(text.strip()) for text in page_texts)
+        if (
+            embedded_text_length >= CV_MIN_TEXT_PER_PAGE * len(page_texts)
+            and all(len(text.strip()) >= OCR_MIN_TEXT_LENGTH for text in page_texts[:3])
+        ):
+            first_pages = [{'page_num': idx + 1, 'text': text} for idx, text in enumerate(page_texts[:3])]
+            personal_future = executor.submit(extract_personal_info, client, first_pages)
+        
+        # Extract all pages with OCR
+        pages_data, ocr_used_pages = apply_ocr_fallback(pdf_bytes, page_texts)
+        total_pages = len(pages_data)
+        shrink_pdf_store()
+        
+        # Image-only document (OCR unavailable or unreadable) - the text passes would see nothing
+        total_text_length = sum(len(p['text'].strip()) for p in pages_data)
+        if total_text_length < CV_MIN_TEXT_PER_PAGE * total_pages:
+            try:
+                result = extract_cv_with_vision(client, pdf_bytes, total_pages)
+            except ValueError as e:
+                parse_failures.append(e)
+                result = vision_result({}, min(CV_VISION_MAX_PAGES, total_pages), total_pages)
+            result["ocr_used_pages"] = ocr_used_pages
+            if parse_failures:
+                raise DegradedCVResult(result)
+            return result
+        
+        # Extract personal info (does not depend on the structure)
+        if personal_future is None:
+            personal_future = executor.submit(extract_personal_info, client, pages_data)
+        
+        # PASS 1: Discover document structure
+        try:
+            structure = discover_document_structure(client, pages_data, total_pages)
+        except ValueError as e:
+            parse_failures.append(e)
+            structure = fallback_structure(total_pages)
+        
+        # PASS 2: Extract experience from each section (CIF, Resume, Experience Letters)
+        section_futures = [
+            executor.submit(
+                extract_section_experience, client, pages_data, structure.get(pages_key, []), section_type
+            )
+            for pages_key, section_type in (
+                ("cif_pages", "CIF"),
+                ("resume_pages", "Resume"),
+                ("experience_letter_pages", "Experience Letter"),
+            )
+        ]
+        
+        personal_info = _result_or_fallback(personal_future, dict(UNKNOWN_PERSONAL_INFO), parse_failures)
+        (cif_experience, cif_exp_list), (resume_experience, resume_exp_list), (exp_letter_found, letter_exp_list) = (
+            _result_or_fallback(future, (dict(SECTION_NOT_FOUND), []), parse_failures)
+            for future in section_futures
+        )
     
-    # PASS 2: Extract experience from each section
     all_experiences = []
-    
-    # CIF Experience
-    cif_experience, cif_exp_list = extract_section_experience(
-        client, pages_data, structure.get("cif_pages", []), "CIF"
-    )
-    all_experiences.extend(cif_exp_list)
-    
-    # Resume Experience
-    resume_experience, resume_exp_list = extract_section_experience(
-        client, pages_data, structure.get("resume_pages", []), "Resume"
-    )
-    all_experiences.extend(resume_exp_list)
-    
-    # Experience Letters
-    exp_letter_found, letter_exp_list = extract_section_experience(
-        client, pages_data, structure.get("experience_letter_pages", []), "Experience Letter"
-    )
-    all_experiences.extend(letter_exp_list)
+    for exp_list in (cif_exp_list, resume_exp_list, letter_exp_list):
+        all_experiences.extend(exp_list)
     
     # Return complete results
-    return {
+    result = {
         "personal_info": personal_info,
         "experience_in_cif": cif_experience,
         "experience_in_resume": resume_experience,
@@ -301,3 +536,6 @@ def process_cv_multipage(client, pdf_file) -> dict:
         "ocr_used_pages": ocr_used_pages,
         "structure": structure
     }
+    if parse_failures:
+        raise DegradedCVResult(result)
+    return result
@@ -5,11 +5,21 @@ using Groq Vision API with business logic for date calculation and standardizati
 """
 
 import base64
-import json
+import hashlib
+import random
 import time
+from functools import lru_cache
 from io import BytesIO
+import streamlit as st
 from PIL import Image
 import fitz  # PyMuPDF
+from utils.api_client import stream_completion_text, is_rate_limit_error, retry_after_seconds
+from utils.llm_json import parse_llm_json
+from utils.pdf_processor import shrink_pdf_store
+from config import (
+    GROQ_MODEL, CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_ENTRIES,
+    DOCUMENT_BATCH_SIZE, IMAGE_MAX_DIMENSION, MAX_RETRY_WAIT_SECONDS
+)
 
 # System prompt with all business logic rules for educational documents
 SYSTEM_PROMPT = """
@@ -158,89 +168,236 @@ FINAL REMINDER:
 ✓ The student's name goes in "Name" - NOT the father's name
 ✓ You must follow ALL rules strictly. Any deviation will lead to data rejection in the Oracle system."""
 
+# Closing instructions shared by the single-image and batched prompts
+EXTRACTION_REMINDER = """CRITICAL REMINDER: Look carefully at the field labels on the document:
+- The field labeled "Name" or "Student Name" = Candidate's Name (put this in "Name" field)
+- The field labeled "Father's Name" or "S/O"/"D/O" = Father's Name (put this in "Father Name" field)
+- DO NOT mix these up. Read the labels carefully before extracting.
+
+Return ONLY valid JSON with no markdown formatting."""
+
+# Complete prompt for single-image requests (static, so it is built once at import)
+SINGLE_IMAGE_PROMPT = f"""{SYSTEM_PROMPT}
+
+Please analyze this image. It may contain ONE or MULTIPLE Pakistani educational documents. Extract all documents found and return them in the documents array.
+
+{EXTRACTION_REMINDER}"""
 
-def convert_pdf_to_image(pdf_file) -> BytesIO:
-    """Convert first page of PDF to image."""
+@lru_cache(maxsize=None)
+def batch_prompt(image_count: int) -> str:
+    """Complete prompt for a multi-image request (built once per batch size)."""
+    return f"""{SYSTEM_PROMPT}
+
+You are given {image_count} images, numbered 1 to {image_count} in the order they are attached. Each image may contain ONE or MULTIPLE Pakistani educational documents. Extract all documents found in every image and return them in the documents array.
+
+IMAGE INDEX: Add an "Image Index" field to EVERY document with the number (1 to {image_count}) of the image it was extracted from.
+
+{EXTRACTION_REMINDER}"""
+
+
+# Changes whenever the prompts change, so cached responses from older prompts are not reused
+# (batch_prompt(0) is the batch template with a placeholder count)
+PROMPT_VERSION = hashlib.md5((SINGLE_IMAGE_PROMPT + batch_prompt(0)).encode("utf-8")).hexdigest()[:8]
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def convert_pdf_to_image(pdf_bytes: bytes) -> bytes:
+    """Convert first page of PDF to image. Cached on the PDF bytes."""
     # Open PDF from bytes
-    pdf_bytes = pdf_file.getvalue()
     pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
     
     # Get first page
     page = pdf_document[0]
     
-    # Render page to image at high resolution
-    mat = fitz.Matrix(2.0, 2.0)  # 2x zoom for better quality
-    pix = page.get_pixmap(matrix=mat)
-    
-    # Convert to PIL Image
-    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    # Render page to image at high resolution (2x zoom for better quality), capped so
+    # the long edge fits IMAGE_MAX_DIMENSION and no PIL downscale pass is needed later
+    zoom = min(2.0, IMAGE_MAX_DIMENSION / max(page.rect.width, page.rect.height))
+    mat = fitz.Matrix(zoom, zoom)
+    pix = page.get_pixmap(matrix=mat, alpha=False)  # RGB only, no alpha channel
     
-    # Save to BytesIO
-    img_bytes = BytesIO()
-    img.save(img_bytes, format="JPEG", quality=95)
-    img_bytes.seek(0)
+    # Encode JPEG straight from the pixmap (no PIL copy of the pixel buffer)
+    img_bytes = pix.tobytes("jpeg", jpg_quality=95)
+    pix = None
     
     pdf_document.close()
+    shrink_pdf_store()
     return img_bytes
 
 
-def encode_image_to_base64(image_file) -> str:
-    """Encode uploaded image file to base64 string."""
-    return base64.b64encode(image_file.getvalue()).decode("utf-8")
+# Magic-byte signatures of the image formats accepted by the uploader
+IMAGE_SIGNATURES = (
+    b"\xff\xd8\xff",         # JPEG
+    b"\x89PNG\r\n\x1a\n",  # PNG
+)
 
 
-def get_image_media_type(filename: str) -> str:
-    """Get the media type based on file extension."""
-    extension = filename.lower().split(".")[-1]
-    media_types = {
-        "jpg": "image/jpeg",
-        "jpeg": "image/jpeg",
-        "png": "image/png",
-    }
-    return media_types.get(extension, "image/jpeg")
+def has_image_signature(file_bytes: bytes) -> bool:
+    """Check the file header for a supported image format without decoding the image."""
+    return file_bytes.startswith(IMAGE_SIGNATURES)
 
 
-def process_document(client, image_file) -> list:
+def _maybe_downscale(img_bytes: bytes, max_dim: int = IMAGE_MAX_DIMENSION) -> bytes:
+    """
+    Shrink an image so its long edge is at most `max_dim` pixels.
+    Only the header is read unless the image is actually oversized.
     """
-    Process a single document image using Groq Vision API.
-    Can handle multiple documents in one image.
+    image = Image.open(BytesIO(img_bytes))
+    if max(image.size) <= max_dim:
+        return img_bytes
+    
+    image.thumbnail((max_dim, max_dim), Image.LANCZOS)
+    output = BytesIO()
+    image.convert("RGB").save(output, format="JPEG", quality=85)
+    return output.getvalue()
+
+
+def _to_base64(raw_bytes) -> str:
+    """Encode raw bytes (or a memoryview) to a base64 string (base64 output is pure ASCII)."""
+    return base64.b64encode(raw_bytes).decode("ascii")
+
+
+def process_documents_batched(client, image_files: list, batch_size: int = DOCUMENT_BATCH_SIZE) -> list:
+    """
+    Process several document images with one Groq Vision request per batch.
     
     Args:
         client: Groq client instance
-        image_file: Uploaded image file (JPG, PNG, or PDF)
+        image_files: Uploaded image files (JPG, PNG, or PDF)
+        batch_size: Maximum number of images sent in one request
         
     Returns:
-        List of dictionaries (one per document found in the image)
+        List with one entry per input file, each a list of document dictionaries
     """
-    # Handle PDF files - convert to image first
-    if image_file.name.lower().endswith('.pdf'):
-        image_bytes = convert_pdf_to_image(image_file)
-        base64_image = base64.b64encode(image_bytes.getvalue()).decode("utf-8")
-    else:
-        # Validate image before encoding
-        try:
-            image_file.seek(0)  # Reset file pointer
-            test_image = Image.open(image_file)
-            test_image.verify()  # Verify it's a valid image
-            image_file.seek(0)  # Reset again for encoding
-        except Exception as e:
-            raise Exception(f"Invalid or corrupted image file. The image may be damaged or in an unsupported format.")
-        
-        # Encode image to base64
-        base64_image = encode_image_to_base64(image_file)
+    results = []
+    for i in range(0, len(image_files), batch_size):
+        batch = tuple((file.getvalue(), file.name) for file in image_files[i:i + batch_size])
+        batch_keys = tuple(_file_key(file_bytes, filename) for file_bytes, filename in batch)
+        if len(batch) == 1:
+            results.append(_process_document_bytes(client, batch_keys[0], batch[0][0], PROMPT_VERSION, GROQ_MODEL))
+        else:
+            results.extend(_process_document_batch_bytes(client, batch_keys, batch, PROMPT_VERSION, GROQ_MODEL))
+    return results
+
+
+def _file_key(file_bytes: bytes, filename: str) -> tuple:
+    """Cache key for an uploaded file: SHA-256 of its bytes plus its name (the name decides PDF handling)."""
+    return hashlib.sha256(file_bytes).hexdigest(), filename
+
+
+def is_valid_document(file_bytes: bytes, filename: str) -> bool:
+    """
+    Fully validate an upload (decode/render included) before it is put into a batch,
+    so one corrupt file can't fail the request for the other images.
+    The prepared payload is cached, so the request itself reuses this work.
+    """
+    try:
+        # verify() checks the image data, not just the header _maybe_downscale reads
+        if not filename.lower().endswith('.pdf'):
+            with Image.open(BytesIO(file_bytes)) as image:
+                image.verify()
+        _encode_document_image(_file_key(file_bytes, filename), file_bytes)
+        return True
+    except Exception:
+        return False
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def _encode_document_image(file_key: tuple, _file_bytes: bytes) -> str:
+    """
+    Validate an uploaded document and return its image as base64 (PDFs are rendered first).
+    Cached on the file hash, so a retried or resubmitted file skips validation and encoding.
+    """
+    file_bytes, filename = _file_bytes, file_key[1]
+    
+    # Handle PDF files - convert to image first (already rendered within IMAGE_MAX_DIMENSION)
+    if filename.lower().endswith('.pdf'):
+        return _to_base64(convert_pdf_to_image(file_bytes))
+    
+    # Validate image header before encoding (the API rejects corrupt image data)
+    if not has_image_signature(file_bytes):
+        raise Exception(f"Invalid or corrupted image file. The image may be damaged or in an unsupported format.")
+    
+    # Downscale oversized scans, then encode image to base64
+    try:
+        image_bytes = _maybe_downscale(file_bytes)
+    except Exception:
+        raise Exception(f"Invalid or corrupted image file. The image may be damaged or in an unsupported format.")
     
-    # Prepare the prompt
-    prompt = f"""{SYSTEM_PROMPT}
+    return _to_base64(image_bytes)
 
-Please analyze this image. It may contain ONE or MULTIPLE Pakistani educational documents. Extract all documents found and return them in the documents array.
 
-CRITICAL REMINDER: Look carefully at the field labels on the document:
-- The field labeled "Name" or "Student Name" = Candidate's Name (put this in "Name" field)
-- The field labeled "Father's Name" or "S/O"/"D/O" = Father's Name (put this in "Father Name" field)
-- DO NOT mix these up. Read the labels carefully before extracting.
+def _image_content(base64_image: str) -> dict:
+    """Build an image_url message part for a base64 encoded image."""
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": f"data:image/jpeg;base64,{base64_image}"
+        }
+    }
 
-Return ONLY valid JSON with no markdown formatting."""
+
+@st.cache_data(persist="disk", max_entries=RESPONSE_CACHE_MAX_ENTRIES, show_spinner=False)
+def _process_document_bytes(_client, file_key: tuple, _file_bytes: bytes, prompt_version: str, model: str) -> list:
+    """
+    Cached single-image request, keyed on the file hash, prompt version and model.
+    Persisted to disk so re-uploaded documents skip the API across restarts.
+    The client and raw bytes are excluded from the cache key (leading underscore).
+    """
+    base64_image = _encode_document_image(file_key, _file_bytes)
+    
+    content = [{"type": "text", "text": SINGLE_IMAGE_PROMPT}, _image_content(base64_image)]
+    return _request_documents(_client, content, model, max_tokens=3000)
+
+
+@st.cache_data(persist="disk", max_entries=RESPONSE_CACHE_MAX_ENTRIES, show_spinner=False)
+def _process_document_batch_bytes(_client, file_keys: tuple, _files: tuple, prompt_version: str, model: str) -> list:
+    """
+    Extract documents from several images in a single request.
     
+    Args:
+        _client: Groq client instance (excluded from the cache key)
+        file_keys: Tuple of (sha256, filename) cache keys, one per image
+        _files: Tuple of (file_bytes, filename) pairs (excluded from the cache key)
+        prompt_version: SYSTEM_PROMPT version (part of the cache key)
+        model: Groq model name
+        
+    Returns:
+        List with one list of document dictionaries per input image
+    """
+    image_count = len(_files)
+    content = [{"type": "text", "text": batch_prompt(image_count)}]
+    content.extend(
+        _image_content(_encode_document_image(file_key, file_bytes))
+        for file_key, (file_bytes, _) in zip(file_keys, _files)
+    )
+    
+    documents = _request_documents(_client, content, model, max_tokens=min(3000 * image_count, 8000))
+    
+    # Group documents back to their source image
+    per_image = [[] for _ in _files]
+    for doc in documents:
+        try:
+            image_idx = int(doc.pop("Image Index")) - 1
+        except (KeyError, TypeError, ValueError):
+            image_idx = -1
+        
+        if not 0 <= image_idx < image_count:
+            # Model did not label the document - fall back to one request per image
+            return [
+                _process_document_bytes(_client, file_key, file_bytes, prompt_version, model)
+                for file_key, (file_bytes, _) in zip(file_keys, _files)
+            ]
+        
+        per_image[image_idx].append(doc)
+    
+    return per_image
+
+
+def _request_documents(client, content: list, model: str, max_tokens: int) -> list:
+    """
+    Send a vision request and parse the documents array from the response.
+    Retries on rate limits, waiting as long as the server asks (exponential backoff otherwise).
+    """
     # Retry logic for rate limiting
     max_retries = 3
     retry_delay = 2
@@ -248,36 +405,21 @@ Return ONLY valid JSON with no markdown formatting."""
     for attempt in range(max_retries):
         try:
             # Create the API request with Groq
-            response = client.chat.completions.create(
-                model="meta-llama/llama-4-scout-17b-16e-instruct",
+            response_text = stream_completion_text(
+                client,
+                model=model,
                 messages=[
                     {
                         "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
-                            }
-                        ]
+                        "content": content
                     }
                 ],
                 temperature=0.05,  # Lower temperature for more consistent, accurate extraction
-                max_tokens=3000     # Increased tokens to give model more capacity for careful analysis
+                max_tokens=max_tokens  # Generous budget gives the model capacity for careful analysis
             )
             
-            # Parse the JSON response
-            response_text = response.choices[0].message.content
-            
-            # Clean markdown formatting if present
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-            
-            parsed_response = json.loads(response_text)
+            # Parse the JSON response (markdown fences are stripped if present)
+            parsed_response = parse_llm_json(response_text)
             
             # Handle both formats
             if "documents" in parsed_response:
@@ -289,9 +431,14 @@ Return ONLY valid JSON with no markdown formatting."""
             error_msg = str(e)
             
             # Handle rate limiting with retry
-            if "rate" in error_msg.lower() or "429" in error_msg or "quota" in error_msg.lower():
+            if is_rate_limit_error(e):
                 if attempt < max_retries - 1:
-                    wait_time = retry_delay * (2 ** attempt)  # Exponential backoff: 2s, 4s, 8s
+                    # Wait as long as the server asks (plus jitter), else exponential backoff: 2s, 4s, 8s
+                    wait_time = retry_after_seconds(e)
+                    if wait_time is None:
+                        wait_time = retry_delay * (2 ** attempt)
+                    else:
+                        wait_time = min(wait_time + random.uniform(0, 0.5), MAX_RETRY_WAIT_SECONDS)
                     time.sleep(wait_time)
                     continue
                 else:
@@ -5,11 +5,31 @@ AI-powered and fuzzy name matching for merging employee and education data
 
 import json
 import re
+from collections import defaultdict
+import numpy as np
 import pandas as pd
+import streamlit as st
+from utils.api_client import stream_completion_text
+from utils.llm_json import parse_llm_json
+from config import NAME_MATCH_MODEL, CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES
 
 
 def ai_match_names(client, edu_names: list, emp_names: list) -> dict:
     """Use AI to match names with variations/typos."""
+    try:
+        return _ai_match_names_cached(client, tuple(edu_names), tuple(emp_names), NAME_MATCH_MODEL)
+    except Exception as e:
+        # Return empty dict on failure - caller will handle fallback
+        return {}
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def _ai_match_names_cached(_client, edu_names: tuple, emp_names: tuple, model: str) -> dict:
+    """
+    Cached body of ai_match_names, keyed on both name lists and the model.
+    Runs at temperature 0, so a repeated merge gets the same mapping without a new call.
+    Errors propagate so failed calls are never cached.
+    """
     prompt = f"""You are a name matching expert. Match names from List A (education records) to List B (employee records).
 Names may have slight spelling variations, typos, or different transliterations (e.g., "Wajahat" vs "Wajahet", "Muhammad" vs "Mohammad").
 
@@ -31,100 +51,216 @@ Return ONLY valid JSON in this format:
   }}
 }}"""
 
-    try:
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            max_tokens=4000
-        )
-        
-        response_text = response.choices[0].message.content
+    response_text = stream_completion_text(
+        _client,
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0,
+        max_tokens=4000
+    )
+    
+    # Parse the JSON response (markdown fences are stripped if present)
+    result = parse_llm_json(response_text)
+    return result.get("matches", {})
+
+
+# Employee fields copied onto matched education records
+EMPLOYEE_MATCH_COLUMNS = ['CNIC', 'EMPLOYEE_NUMBER', 'FULL_NAME']
+
+# Name normalization patterns (compiled once)
+_WHITESPACE_RE = re.compile(r'\s+')
+_NAME_PUNCTUATION_RE = re.compile(r'[^a-z0-9\s\-]')
+
+# Transliteration variants of the same name word (normalized spelling -> canonical)
+NAME_TOKEN_ALIASES = {
+    'mohammad': 'muhammad',
+    'mohammed': 'muhammad',
+    'mohamed': 'muhammad',
+    'muhammed': 'muhammad',
+    'muhamad': 'muhammad',
+    'mohamad': 'muhammad',
+    'mohd': 'muhammad',
+    'muhd': 'muhammad',
+    'md': 'muhammad',
+}
+
+
+def normalize_names(names: pd.Series) -> pd.Series:
+    """
+    Normalize a column of names for robust matching.
+    Handles multiple spaces, trailing dots, case differences; uses pandas
+    string methods instead of a Python call per row.
+    """
+    return (
+        names.astype('string')
+        .str.lower()
+        .str.strip()
+        .str.rstrip('.,')
+        .str.replace(_WHITESPACE_RE, ' ', regex=True)
+        .str.replace(_NAME_PUNCTUATION_RE, '', regex=True)
+        .str.strip()
+        .fillna('')
+        .astype(object)
+    )
+
+
+def fuzzy_match_names(merged_df, emp_df_unique, unmatched_mask):
+    """
+    Perform fuzzy matching using word overlap method.
+    
+    Shared-word counts against all employees are computed per education name
+    with an inverted word index and np.bincount, instead of a Python loop
+    over every employee row. Names left unmatched are then matched when every
+    word is equal after mapping known transliteration variants (e.g. "Mohammad"
+    vs "Muhammad") through NAME_TOKEN_ALIASES; other spelling differences are
+    left for the AI pass.
+    
+    Args:
+        merged_df: DataFrame with education and employee data
+        emp_df_unique: Unique employee records
+        unmatched_mask: Boolean mask for unmatched records
         
-        # Clean markdown formatting if present
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0]
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0]
+    Returns:
+        tuple: (merged_df, fuzzy_matched_count)
+    """
+    # Matched merged_df row labels and the positions of their employee records
+    match_indices = []
+    match_emp_positions = []
+    
+    # Word sets for every employee (computed once, not per education row)
+    emp_word_sets = [set(name.split()) for name in emp_df_unique['name_normalized']]
+    emp_count = len(emp_word_sets)
+    if emp_count == 0:
+        return merged_df, 0
+    
+    # Only employee names with at least 2 words can match
+    emp_eligible = np.array([len(words) >= 2 for words in emp_word_sets])
+    
+    # Inverted index: word -> positions of employees whose name contains it
+    word_positions = defaultdict(list)
+    for emp_pos, words in enumerate(emp_word_sets):
+        for word in words:
+            word_positions[word].append(emp_pos)
+    word_index = {word: np.array(positions) for word, positions in word_positions.items()}
+    
+    # Best employee position per distinct education name (None if no match)
+    best_by_name = {}
+    
+    unmatched_names = merged_df.loc[unmatched_mask, 'name_normalized']
+    for idx, edu_name_norm in zip(unmatched_names.index, unmatched_names.to_numpy()):
+        if edu_name_norm not in best_by_name:
+            best_by_name[edu_name_norm] = _best_word_overlap_match(
+                edu_name_norm, word_index, emp_eligible, emp_count
+            )
         
-        result = json.loads(response_text.strip())
-        return result.get("matches", {})
-    except Exception as e:
-        # Return empty dict on failure - caller will handle fallback
-        return {}
+        best_pos = best_by_name[edu_name_norm]
+        if best_pos is not None:
+            match_indices.append(idx)
+            match_emp_positions.append(best_pos)
+    
+    matched = set(match_indices)
+    remaining = [idx for idx in merged_df.index[unmatched_mask.to_numpy()] if idx not in matched]
+    alias_indices, alias_positions = _alias_token_match(merged_df, emp_df_unique, emp_eligible, remaining)
+    match_indices.extend(alias_indices)
+    match_emp_positions.extend(alias_positions)
+    
+    merged_df = assign_employee_matches(merged_df, match_indices, emp_df_unique, match_emp_positions)
+    
+    return merged_df, len(match_indices)
 
 
-def normalize_name(name):
+def _best_word_overlap_match(edu_name_norm: str, word_index: dict, emp_eligible, emp_count: int):
     """
-    Normalize a name for robust matching.
-    Handles multiple spaces, trailing dots, case differences.
+    Find the employee sharing the most words with a normalized education name.
+    
+    Args:
+        edu_name_norm: Normalized education name
+        word_index: Word -> array of employee positions whose name contains it
+        emp_eligible: Boolean array of employees with at least 2 name words
+        emp_count: Number of employee records
+        
+    Returns:
+        Position of the best employee in emp_df_unique, or None if below threshold
     """
-    if pd.isna(name):
-        return ""
+    edu_words = set(edu_name_norm.split())
+    if len(edu_words) < 2:
+        return None
     
-    # Convert to string and lowercase
-    name = str(name).lower().strip()
+    postings = [word_index[word] for word in edu_words if word in word_index]
+    if not postings:
+        return None
     
-    # Remove trailing dots and commas
-    name = name.rstrip('.,')
+    # Number of words each employee name shares with the education name
+    common_words = np.bincount(np.concatenate(postings), minlength=emp_count)
+    common_words[~emp_eligible] = 0
     
-    # Replace multiple spaces with single space
-    name = re.sub(r'\s+', ' ', name)
+    # Score based on proportion of education name matched,
+    # boosted if all education words are matched; at least 2 words must match
+    scores = common_words / len(edu_words) + 0.5 * (common_words == len(edu_words))
+    scores[common_words < 2] = 0
     
-    # Remove extra punctuation but keep hyphens in names
-    name = re.sub(r'[^a-z0-9\s\-]', '', name)
+    # argmax keeps the first employee among equal scores
+    best_pos = int(scores.argmax())
     
-    return name.strip()
+    # Apply match if score is high enough (>= 80%)
+    return best_pos if scores[best_pos] >= 0.8 else None
 
 
-def fuzzy_match_names(merged_df, emp_df_unique, unmatched_mask):
+def _canonical_name_key(name_norm: str) -> tuple:
+    """Sorted name words with known transliteration variants mapped to one spelling."""
+    return tuple(sorted(NAME_TOKEN_ALIASES.get(word, word) for word in name_norm.split()))
+
+
+def _alias_token_match(merged_df, emp_df_unique, emp_eligible, row_indices: list):
     """
-    Perform fuzzy matching using word overlap method.
+    Match rows whose words all equal an employee's words after alias mapping.
+    Only spellings listed in NAME_TOKEN_ALIASES are treated as the same word, so
+    one-letter differences such as "asif" vs "arif" never match here.
     
     Args:
         merged_df: DataFrame with education and employee data
         emp_df_unique: Unique employee records
-        unmatched_mask: Boolean mask for unmatched records
+        emp_eligible: Boolean array of employees with at least 2 name words
+        row_indices: Index labels of the merged_df rows still unmatched
         
     Returns:
-        tuple: (merged_df, fuzzy_matched_count)
+        tuple: (matched row labels, positions of their employee records)
     """
-    fuzzy_matched_count = 0
+    if not row_indices:
+        return [], []
     
-    for idx in merged_df[unmatched_mask].index:
-        edu_name_norm = merged_df.loc[idx, 'name_normalized']
-        edu_words = set(edu_name_norm.split())
-        
-        # Find best match based on word overlap
-        best_match = None
-        best_score = 0
-        
-        for _, emp_row in emp_df_unique.iterrows():
-            emp_name_norm = emp_row['name_normalized']
-            emp_words = set(emp_name_norm.split())
-            
-            if len(edu_words) >= 2 and len(emp_words) >= 2:
-                # Calculate word overlap score
-                common_words = edu_words.intersection(emp_words)
-                
-                # At least 2 words must match
-                if len(common_words) >= 2:
-                    # Score based on proportion of education name matched
-                    score = len(common_words) / len(edu_words)
-                    
-                    # Boost score if all education words are matched
-                    if len(common_words) == len(edu_words):
-                        score += 0.5
-                    
-                    if score > best_score:
-                        best_score = score
-                        best_match = emp_row
+    # First eligible employee per canonical name
+    emp_by_key = {}
+    emp_names = emp_df_unique['name_normalized'].to_numpy()
+    for emp_pos in np.flatnonzero(emp_eligible):
+        emp_by_key.setdefault(_canonical_name_key(emp_names[emp_pos]), int(emp_pos))
+    
+    matched_rows = []
+    matched_positions = []
+    edu_names = merged_df.loc[row_indices, 'name_normalized']
+    for idx, edu_name_norm in zip(edu_names.index, edu_names.to_numpy()):
+        key = _canonical_name_key(edu_name_norm)
+        if len(key) >= 2 and key in emp_by_key:
+            matched_rows.append(idx)
+            matched_positions.append(emp_by_key[key])
+    return matched_rows, matched_positions
+
+
+def assign_employee_matches(merged_df, row_indices: list, emp_df_unique, emp_positions: list):
+    """
+    Copy employee fields onto matched education rows in one bulk assignment.
+    
+    Args:
+        merged_df: DataFrame with education and employee data
+        row_indices: Index labels of the matched rows in merged_df
+        emp_df_unique: Unique employee records
+        emp_positions: Positional index into emp_df_unique for each matched row
         
-        # Apply match if score is high enough (>= 80%)
-        if best_match is not None and best_score >= 0.8:
-            merged_df.loc[idx, 'CNIC'] = best_match['CNIC']
-            merged_df.loc[idx, 'EMPLOYEE_NUMBER'] = best_match['EMPLOYEE_NUMBER']
-            merged_df.loc[idx, 'FULL_NAME'] = best_match['FULL_NAME']
-            fuzzy_matched_count += 1
-    
-    return merged_df, fuzzy_matched_count
+    Returns:
+        merged_df with CNIC, EMPLOYEE_NUMBER and FULL_NAME filled in
+    """
+    if row_indices:
+        merged_df.loc[row_indices, EMPLOYEE_MATCH_COLUMNS] = (
+            emp_df_unique[EMPLOYEE_MATCH_COLUMNS].iloc[emp_positions].to_numpy()
+        )
+    return merged_df
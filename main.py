@@ -9,38 +9,126 @@ NEW MODULAR STRUCTURE:
 - pages/: Streamlit page components
 """
 import streamlit as st
-from config import APP_TITLE, APP_ICON, APP_LAYOUT
+from config import (
+    APP_TITLE, APP_ICON, APP_LAYOUT, SESSION_PERSON_NUMBER,
+    PAGE_DOCUMENT_PARSER, PAGE_SPREADSHEET_LOADER, PAGE_SCHOOL_STANDARDIZER,
+    PAGE_EXPERIENCE_PARSER, PAGE_SETTINGS
+)
 
-# Import page modules
-from pages.document_parser import document_parser_page
-from pages.spreadsheet_loader import spreadsheet_loader_page
-from pages.experience_parser import experience_parser_page
-from pages.school_standardizer import school_name_standardizer_page
-from pages.settings import settings_page
+# Page modules are imported inside the page functions below, so a session only
+# loads the module graph (Groq, PDF, Excel libraries) of the pages it opens
+
+
+# Custom CSS styling (module constant, sent as-is without a markdown pass)
+CUSTOM_CSS = """
+<style>
+.main-header {
+    font-size: 2.5rem;
+    font-weight: bold;
+    color: #1E88E5;
+    text-align: center;
+    margin-bottom: 1rem;
+}
+.sub-header {
+    font-size: 1.2rem;
+    color: #424242;
+    text-align: center;
+    margin-bottom: 2rem;
+}
+.stButton>button {
+    width: 100%;
+}
+</style>
+"""
+
+# Sidebar logo, rendered inline so no image is fetched or hashed per session
+SIDEBAR_LOGO_HTML = f'<div style="font-size: 64px; line-height: 80px;">{APP_ICON}</div><hr>'
+
+# Static sidebar content: quick guide and supported documents
+SIDEBAR_STATIC_HTML = """
+<hr>
+<h3>📋 Quick Guide</h3>
+<ol>
+    <li>Configure API keys in Settings</li>
+    <li>Upload documents or spreadsheets</li>
+    <li>Enter the Person Number (for Document Parser)</li>
+    <li>Click Process/Merge button</li>
+    <li>Download the Excel file</li>
+</ol>
+<hr>
+<h3>📄 Supported Documents</h3>
+<ul>
+    <li>Matriculation / SSC</li>
+    <li>Intermediate / HSSC / FSc / FA</li>
+    <li>Bachelor Degrees</li>
+    <li>Master Degrees</li>
+    <li>Diplomas (DAE)</li>
+    <li>CV/Resume (multi-page PDF)</li>
+    <li>Experience Letters</li>
+</ul>
+"""
 
 
 def apply_custom_css():
     """Apply custom CSS styling to the app."""
-    st.markdown("""
-        <style>
-        .main-header {
-            font-size: 2.5rem;
-            font-weight: bold;
-            color: #1E88E5;
-            text-align: center;
-            margin-bottom: 1rem;
-        }
-        .sub-header {
-            font-size: 1.2rem;
-            color: #424242;
-            text-align: center;
-            margin-bottom: 2rem;
-        }
-        .stButton>button {
-            width: 100%;
-        }
-        </style>
-    """, unsafe_allow_html=True)
+    st.html(CUSTOM_CSS)
+
+
+@st.fragment
+def _person_number_input():
+    """
+    Person Number input (used by Document Parser).
+    A fragment, so entering a number reruns only this input instead of the
+    whole page; the Document Parser reads the value from session state when
+    it next runs. st.text_input commits on Enter or blur, not per keystroke.
+    """
+    st.text_input(
+        "👤 Person Number",
+        placeholder="Enter Oracle Person Number",
+        help="This number will be added to each record for Oracle import",
+        key=SESSION_PERSON_NUMBER
+    )
+
+
+def _document_parser():
+    """Document Parser page (Person Number comes from the sidebar input)."""
+    from pages.document_parser import document_parser_page
+    document_parser_page(st.session_state.get(SESSION_PERSON_NUMBER, ""))
+
+
+def _spreadsheet_loader():
+    """Spreadsheet Loader page."""
+    from pages.spreadsheet_loader import spreadsheet_loader_page
+    spreadsheet_loader_page()
+
+
+def _school_standardizer():
+    """School Standardizer page."""
+    from pages.school_standardizer import school_name_standardizer_page
+    school_name_standardizer_page()
+
+
+def _experience_parser():
+    """Experience Parser page."""
+    from pages.experience_parser import experience_parser_page
+    experience_parser_page()
+
+
+def _settings():
+    """Settings page."""
+    from pages.settings import settings_page
+    settings_page()
+
+
+# Page routing table: url path -> (page function, title, icon)
+PAGES = {
+    "document-parser": (_document_parser, PAGE_DOCUMENT_PARSER, "📄"),
+    "spreadsheet-loader": (_spreadsheet_loader, PAGE_SPREADSHEET_LOADER, "📊"),
+    "school-standardizer": (_school_standardizer, PAGE_SCHOOL_STANDARDIZER, "🏫"),
+    "experience-parser": (_experience_parser, PAGE_EXPERIENCE_PARSER, "👔"),
+    "settings": (_settings, PAGE_SETTINGS, "⚙️"),
+}
+DEFAULT_PAGE = "document-parser"
 
 
 def main():
@@ -55,65 +143,21 @@ def main():
     # Apply custom CSS
     apply_custom_css()
     
-    # Sidebar navigation
+    # Navigation - Streamlit runs only the selected page's function
+    page = st.navigation([
+        st.Page(page_func, title=title, icon=icon, url_path=url_path, default=(url_path == DEFAULT_PAGE))
+        for url_path, (page_func, title, icon) in PAGES.items()
+    ])
+    
     with st.sidebar:
-        st.image("https://img.icons8.com/color/96/000000/graduation-cap.png", width=80)
-        st.title("⚙️ Navigation")
-        st.markdown("---")
-        
-        # Navigation
-        page = st.radio(
-            "Select Page",
-            ["📄 Document Parser", "📊 Spreadsheet Loader", "🏫 School Standardizer", "👔 Experience Parser", "⚙️ Settings"],
-            label_visibility="collapsed"
-        )
-        
-        st.markdown("---")
-        
-        # Person Number input (used by Document Parser)
-        person_number = st.text_input(
-            "👤 Person Number",
-            placeholder="Enter Oracle Person Number",
-            help="This number will be added to each record for Oracle import"
-        )
-        
-        st.markdown("---")
-        
-        # Instructions
-        st.markdown("### 📋 Quick Guide")
-        st.markdown("""
-        1. Configure API keys in Settings
-        2. Upload documents or spreadsheets
-        3. Enter the Person Number (for Document Parser)
-        4. Click Process/Merge button
-        5. Download the Excel file
-        """)
+        st.html(SIDEBAR_LOGO_HTML)
         
-        st.markdown("---")
+        _person_number_input()
         
-        # Supported formats
-        st.markdown("### 📄 Supported Documents")
-        st.markdown("""
-        - Matriculation / SSC
-        - Intermediate / HSSC / FSc / FA
-        - Bachelor Degrees
-        - Master Degrees
-        - Diplomas (DAE)
-        - CV/Resume (multi-page PDF)
-        - Experience Letters
-        """)
+        # Quick guide and supported documents (static, one element)
+        st.html(SIDEBAR_STATIC_HTML)
     
-    # Route to selected page
-    if page == "📄 Document Parser":
-        document_parser_page(person_number)
-    elif page == "📊 Spreadsheet Loader":
-        spreadsheet_loader_page()
-    elif page == "🏫 School Standardizer":
-        school_name_standardizer_page()
-    elif page == "👔 Experience Parser":
-        experience_parser_page()
-    elif page == "⚙️ Settings":
-        settings_page()
+    page.run()
 
 
 if __name__ == "__main__":
@@ -393,7 +393,11 @@ Return ONLY valid JSON with no markdown formatting."""
 def convert_df_to_excel(df: pd.DataFrame) -> bytes:
     """Convert DataFrame to Excel bytes for download."""
     output = BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+    with pd.ExcelWriter(
+        output,
+        engine="xlsxwriter",
+        engine_kwargs={"options": {"strings_to_urls": False}},
+    ) as writer:
         df.to_excel(writer, index=False, sheet_name="Education Data")
     return output.getvalue()
 
@@ -468,32 +472,6 @@ def process_cv_multipage(client, pdf_file) -> dict:
     
     pdf_document.close()
     
-    Args:
-        client: Groq client instance
-        pdf_file: Uploaded PDF file
-        
-    Returns:
-        Dictionary with extracted data
-    """
-    # Open PDF and extract pages
-    pdf_bytes = pdf_file.getvalue()
-    pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
-    
-    # Step 1: Extract and classify each page
-    pages_data = []
-    for page_num in range(len(pdf_document)):
-        page = pdf_document[page_num]
-        page_text = page.get_text()
-        page_type = classify_page_type(page_text)
-        
-        pages_data.append({
-            'page_num': page_num + 1,
-            'text': page_text,
-            'type': page_type
-        })
-    
-    pdf_document.close()
-    
     # ========== PASS 1: DOCUMENT STRUCTURE DISCOVERY ==========
     # Create a sample of pages for structure analysis (first 3, middle 2, last 3)
     sample_pages = []
@@ -6,11 +6,28 @@ UI for processing Pakistani educational documents (Degrees, Transcripts, Markshe
 import streamlit as st
 import pandas as pd
 import json
-import time
+from io import BytesIO
+from PIL import Image
 
+from config import DOCUMENT_BATCH_SIZE, PREVIEW_THUMBNAIL_SIZE, CACHE_MAX_ENTRIES
 from utils.api_client import get_api_keys, create_groq_client_with_fallback
-from utils.excel_export import convert_df_to_excel
-from extractors.document_extractor import process_document
+from utils.excel_export import session_excel_bytes
+from extractors.document_extractor import process_documents_batched, is_valid_document
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _make_thumbnail(file_bytes: bytes, file_name: str) -> bytes:
+    """
+    Downscale an uploaded image for the preview grid.
+    Cached so reruns don't re-decode every upload.
+    """
+    img = Image.open(BytesIO(file_bytes))
+    img.thumbnail((PREVIEW_THUMBNAIL_SIZE, PREVIEW_THUMBNAIL_SIZE))
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGB")
+    output = BytesIO()
+    img.save(output, format="WEBP", quality=70)
+    return output.getvalue()
 
 
 def document_parser_page(person_number: str):
@@ -40,7 +57,7 @@ def document_parser_page(person_number: str):
                     st.caption("PDF file (will be converted to image)")
                 else:
                     try:
-                        st.image(file, caption=file.name, use_container_width=True)
+                        st.image(_make_thumbnail(file.getvalue(), file.name), caption=file.name, use_container_width=True)
                     except Exception as e:
                         st.warning(f"⚠️ Could not preview {file.name}")
                         st.caption(f"Image may be corrupted but will still be processed")
@@ -61,7 +78,11 @@ def document_parser_page(person_number: str):
             disabled=not (uploaded_files and has_valid_keys)
         )
     
-    # Initialize session state for results
+    # Initialize session state for results (frames are appended per batch and
+    # concatenated into results_df only when the results are displayed)
+    if "results_frames" not in st.session_state:
+        st.session_state.results_frames = []
+    
     if "results_df" not in st.session_state:
         st.session_state.results_df = None
     
@@ -73,8 +94,6 @@ def document_parser_page(person_number: str):
     
     # Processing logic
     if process_button:
-        api_keys = get_api_keys()
-        
         if not any(k for k in api_keys):
             st.error("⚠️ Please configure your Groq API Keys in Settings page.")
         elif not uploaded_files:
@@ -83,52 +102,80 @@ def document_parser_page(person_number: str):
             st.warning("⚠️ Person Number is empty. Records will be created without it.")
             
         if any(k for k in api_keys) and uploaded_files:
-            # Process each document with fallback support
-            results = []
-            progress_bar = st.progress(0)
-            status_text = st.empty()
+            # Process documents in batches (several images per API request) with fallback support.
+            # Documents extracted per file are kept in session state as each batch completes,
+            # so a rerun that interrupts processing doesn't repeat finished Groq calls.
+            # Entries are keyed by the upload's file_id, which changes when a file is re-uploaded,
+            # so a changed file with the same name is never served stale documents.
+            in_flight = st.session_state.setdefault("results_in_flight", {})
             
-            for idx, file in enumerate(uploaded_files):
-                status_text.text(f"Processing {file.name}... ({idx + 1}/{len(uploaded_files)})")
+            # Drop partial results of files that are no longer uploaded
+            current_file_ids = {file.file_id for file in uploaded_files}
+            for file_id in set(in_flight) - current_file_ids:
+                del in_flight[file_id]
+            
+            with st.status("Processing documents...", expanded=True) as status:
+                # Skip invalid/corrupted files up front (fully decoded, not just the header)
+                # so they don't fail a whole batch
+                valid_files = []
+                for file in uploaded_files:
+                    if is_valid_document(file.getvalue(), file.name):
+                        valid_files.append(file)
+                    else:
+                        st.warning(f"⚠️ Skipped {file.name}: Invalid or corrupted file")
+                
+                # Only valid files count towards progress; finished ones are already in in_flight
+                total_files = len(valid_files)
+                pending_files = [file for file in valid_files if file.file_id not in in_flight]
+                processed_count = total_files - len(pending_files)
                 
-                try:
-                    # Process the document using fallback keys
-                    documents = create_groq_client_with_fallback(api_keys, process_document, file)
+                for batch_start in range(0, len(pending_files), DOCUMENT_BATCH_SIZE):
+                    batch = pending_files[batch_start:batch_start + DOCUMENT_BATCH_SIZE]
+                    batch_names = ", ".join(file.name for file in batch)
+                    status.update(label=f"Processing {batch_names}... ({processed_count + len(batch)}/{total_files})")
                     
-                    # Add person number and source file to each document
-                    for doc_idx, result in enumerate(documents):
-                        result["Person Number"] = person_number if person_number else ""
-                        result["Source File"] = file.name
+                    try:
+                        # Process the batch using fallback keys (each request waits on its key's rate limiter)
+                        batch_documents = create_groq_client_with_fallback(api_keys, process_documents_batched, batch)
                         
-                        # If multiple docs in one file, add document number
-                        if len(documents) > 1:
-                            result["Source File"] = f"{file.name} (Doc {doc_idx + 1}/{len(documents)})"
+                        for file, documents in zip(batch, batch_documents):
+                            in_flight[file.file_id] = documents
+                            
+                            # Show info if multiple documents detected
+                            if len(documents) > 1:
+                                st.info(f"ℹ️ {file.name}: Found {len(documents)} documents in this file")
                         
-                        results.append(result)
-                    
-                    # Show info if multiple documents detected
-                    if len(documents) > 1:
-                        st.info(f"ℹ️ {file.name}: Found {len(documents)} documents in this file")
-                    
-                    # Add delay between requests to avoid rate limits (2 seconds)
-                    if idx < len(uploaded_files) - 1:  # Don't delay after last file
-                        time.sleep(2.0)
-                    
-                except json.JSONDecodeError as e:
-                    st.error(f"❌ Failed to parse response for {file.name}: {str(e)}")
-                except Exception as e:
-                    error_msg = str(e)
+                    except json.JSONDecodeError as e:
+                        st.error(f"❌ Failed to parse response for {batch_names}: {str(e)}")
+                    except Exception as e:
+                        error_msg = str(e)
+                        
+                        # Handle invalid/corrupted images
+                        if "Invalid or corrupted image" in error_msg:
+                            st.warning(f"⚠️ Skipped {batch_names}: Invalid or corrupted image file")
+                        else:
+                            st.error(f"❌ Error processing {batch_names}: {str(e)}")
                     
-                    # Handle invalid/corrupted images
-                    if "Invalid or corrupted image" in error_msg:
-                        st.warning(f"⚠️ Skipped {file.name}: Invalid or corrupted image file")
-                    else:
-                        st.error(f"❌ Error processing {file.name}: {str(e)}")
+                    # Count only the files whose documents were extracted
+                    processed_count += sum(1 for file in batch if file.file_id in in_flight)
                 
-                # Update progress
-                progress_bar.progress((idx + 1) / len(uploaded_files))
+                status.update(label="✅ Processing complete!", state="complete", expanded=False)
             
-            status_text.text("✅ Processing complete!")
+            # Collect results in upload order
+            results = []
+            for file in valid_files:
+                documents = in_flight.pop(file.file_id, [])
+                
+                # Add person number and source file to each document
+                for doc_idx, result in enumerate(documents):
+                    result["Person Number"] = person_number if person_number else ""
+                    result["Source File"] = file.name
+                    
+                    # If multiple docs in one file, add document number
+                    if len(documents) > 1:
+                        result["Source File"] = f"{file.name} (Doc {doc_idx + 1}/{len(documents)})"
+                    
+                    results.append(result)
             
             # Create DataFrame
             if results:
@@ -152,23 +199,42 @@ def document_parser_page(person_number: str):
                 df = pd.DataFrame(results)
                 
                 # Reorder columns (only include columns that exist)
-                existing_cols = [col for col in column_order if col in df.columns]
-                other_cols = [col for col in df.columns if col not in column_order]
-                df = df[existing_cols + other_cols]
+                column_order_set = set(column_order)
+                df_columns_set = set(df.columns)
+                existing_cols = [col for col in column_order if col in df_columns_set]
+                other_cols = [col for col in df.columns if col not in column_order_set]
+                df = df.reindex(columns=existing_cols + other_cols, copy=False)
                 
                 # Append to existing results instead of replacing
-                if st.session_state.results_df is not None:
-                    st.session_state.results_df = pd.concat([st.session_state.results_df, df], ignore_index=True)
-                else:
-                    st.session_state.results_df = df
+                st.session_state.results_frames.append(df)
+                total_records = sum(len(frame) for frame in st.session_state.results_frames)
                 
                 # Track processed files
-                for file in uploaded_files:
-                    st.session_state.processed_files.add(file.name)
+                st.session_state.processed_files |= {file.name for file in uploaded_files}
                 
-                st.success(f"✅ Successfully processed {len(results)} document(s)! Total records: {len(st.session_state.results_df)}")
+                st.success(f"✅ Successfully processed {len(results)} document(s)! Total records: {total_records}")
     
-    # Display results
+    # Display results (a fragment, so its widgets rerun only this section)
+    _render_document_results()
+
+
+def _materialize_results():
+    """
+    Concatenate pending result frames into st.session_state.results_df.
+    Frames are collapsed into one, so each batch is copied once rather than
+    re-copying the whole accumulated table on every append.
+    """
+    frames = st.session_state.results_frames
+    if len(frames) > 1:
+        st.session_state.results_frames = [pd.concat(frames, ignore_index=True)]
+    st.session_state.results_df = st.session_state.results_frames[0] if frames else None
+    return st.session_state.results_df
+
+
+@st.fragment
+def _render_document_results():
+    """Display extracted records, downloads and summary."""
+    _materialize_results()
     if st.session_state.results_df is not None and not st.session_state.results_df.empty:
         st.markdown("---")
         
@@ -187,6 +253,8 @@ def document_parser_page(person_number: str):
             with col1:
                 if st.button("✅ Yes, Clear", type="primary", use_container_width=True):
                     # Clear session state
+                    st.session_state.results_frames = []
+                    st.session_state.results_in_flight = {}
                     st.session_state.results_df = None
                     st.session_state.processed_files = set()
                     st.session_state.show_clear_confirmation = False
@@ -209,7 +277,7 @@ def document_parser_page(person_number: str):
         st.markdown("---")
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
-            excel_data = convert_df_to_excel(st.session_state.results_df)
+            excel_data = session_excel_bytes(st.session_state.results_df, "results_xlsx")
             st.download_button(
                 label="📥 Download Excel File",
                 data=excel_data,
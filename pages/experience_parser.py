@@ -3,13 +3,99 @@ Experience Parser Page - Extract experience from merged candidate documents
 """
 import streamlit as st
 import pandas as pd
-import time
-from config import SESSION_CV_RESULTS
-from utils.api_client import get_api_keys, create_groq_client_with_fallback
-from utils.excel_export import convert_df_to_excel
+from concurrent.futures import as_completed
+from config import SESSION_CV_SUMMARY, SESSION_CV_DETAILED
+from utils.api_client import get_api_keys, create_groq_client_with_fallback, thread_pool_with_script_ctx
+from utils.excel_export import session_excel_bytes
 from extractors.cv_extractor import process_cv_multipage
 
 
+# Experience fields copied into the detailed table (column -> key in the extracted record)
+DETAILED_EXPERIENCE_FIELDS = {
+    'Source': 'source',
+    'Employer': 'employer',
+    'Designation/Grade': 'designation',
+    'Date of Joining': 'date_joining',
+    'Date of Leaving': 'date_leaving',
+    'Duration (Months)': 'duration_months',
+    'Monthly Salary': 'monthly_salary',
+    'Responsibilities': 'responsibilities',
+}
+
+
+# YES/NO flag columns share one fixed category set, so appended session frames keep the dtype
+YES_NO_DTYPE = pd.CategoricalDtype(['NO', 'YES'])
+SUMMARY_DTYPES = {
+    'Experience in CIF': YES_NO_DTYPE,
+    'Experience in Resume': YES_NO_DTYPE,
+    'Experience Letter Attached': YES_NO_DTYPE,
+    'Total Experience Records': 'int16',
+}
+
+
+def _build_result_tables(cv_results: list) -> tuple:
+    """
+    Build the summary and detailed experience tables in a single pass over the CV results.
+    Values are collected column by column (one list per column) so pandas builds
+    each column directly instead of converting a list of per-row dicts.
+    
+    Returns:
+        tuple: (df_summary, df_detailed)
+    """
+    summary = {
+        column: [] for column in (
+            'Name', 'CNIC', 'Email', 'Contact',
+            'Experience in CIF', 'CIF Details',
+            'Experience in Resume', 'Resume Details',
+            'Experience Letter Attached', 'Letter Details',
+            'Total Experience Records', 'Source File',
+        )
+    }
+    detailed = {column: [] for column in ('Name', 'CNIC', *DETAILED_EXPERIENCE_FIELDS, 'Source File')}
+    
+    for cv in cv_results:
+        personal = cv.get('personal_info', {})
+        exp_cif = cv.get('experience_in_cif', {})
+        exp_resume = cv.get('experience_in_resume', {})
+        exp_letter = cv.get('experience_letter_found', {})
+        all_experiences = cv.get('all_experiences', [])
+        name = personal.get('full_name', 'Unknown')
+        cnic = personal.get('cnic', '')
+        source_file = cv.get('source_file', '')
+        
+        summary['Name'].append(name)
+        summary['CNIC'].append(cnic)
+        summary['Email'].append(personal.get('email', ''))
+        summary['Contact'].append(personal.get('contact', ''))
+        summary['Experience in CIF'].append('YES' if exp_cif.get('found') else 'NO')
+        summary['CIF Details'].append(exp_cif.get('details', ''))
+        summary['Experience in Resume'].append('YES' if exp_resume.get('found') else 'NO')
+        summary['Resume Details'].append(exp_resume.get('details', ''))
+        summary['Experience Letter Attached'].append('YES' if exp_letter.get('found') else 'NO')
+        summary['Letter Details'].append(exp_letter.get('details', ''))
+        summary['Total Experience Records'].append(len(all_experiences))
+        summary['Source File'].append(source_file)
+        
+        # One detailed row per experience; the per-CV columns repeat
+        exp_count = len(all_experiences)
+        detailed['Name'].extend([name] * exp_count)
+        detailed['CNIC'].extend([cnic] * exp_count)
+        detailed['Source File'].extend([source_file] * exp_count)
+        for column, field in DETAILED_EXPERIENCE_FIELDS.items():
+            detailed[column].extend(exp.get(field, '') for exp in all_experiences)
+    
+    return pd.DataFrame(summary).astype(SUMMARY_DTYPES), pd.DataFrame(detailed)
+
+
+def _append_to_session_df(key: str, new_df: pd.DataFrame):
+    """Append rows to a DataFrame kept in session state."""
+    existing_df = st.session_state.get(key)
+    if existing_df is None or existing_df.empty:
+        st.session_state[key] = new_df
+    elif not new_df.empty:
+        st.session_state[key] = pd.concat([existing_df, new_df], ignore_index=True)
+
+
 def experience_parser_page():
     """CV/Experience Parser Page - Extract EXPERIENCE data from merged candidate documents."""
     st.markdown('<div class="main-header">👔 Experience Parser</div>', unsafe_allow_html=True)
@@ -49,115 +135,93 @@ def experience_parser_page():
     
     # Process CVs
     if process_cv_button:
-        api_keys = get_api_keys()
-        
         if not any(k for k in api_keys):
             st.error("⚠️ Please configure your Groq API Keys in Settings page.")
         elif not uploaded_cv_files:
             st.error("⚠️ Please upload at least one CV/Resume PDF.")
         else:
-            # Process each CV
-            results = []
+            # Process CVs concurrently - the work is dominated by Groq HTTP latency
+            total_files = len(uploaded_cv_files)
+            results_by_idx = [None] * total_files
             progress_bar = st.progress(0)
             status_text = st.empty()
+            status_text.text(f"📄 Processing {total_files} file(s)...")
             
-            for idx, file in enumerate(uploaded_cv_files):
-                status_text.text(f"📄 Processing {file.name}... ({idx + 1}/{len(uploaded_cv_files)})")
+            def process_file(file):
+                # The shared key pool hands concurrent workers different keys round-robin;
+                # every Groq request they make waits on its key's shared rate limiter
+                return create_groq_client_with_fallback(api_keys, process_cv_multipage, file)
+            
+            max_workers = min(total_files, len(api_keys) * 2)
+            with thread_pool_with_script_ctx(max_workers) as executor:
+                futures = {
+                    executor.submit(process_file, file): (idx, file)
+                    for idx, file in enumerate(uploaded_cv_files)
+                }
                 
-                try:
-                    # Process CV using fallback keys
-                    cv_data = create_groq_client_with_fallback(api_keys, process_cv_multipage, file)
-                    cv_data['source_file'] = file.name
-                    results.append(cv_data)
-                    
-                    # Show OCR info if used
-                    if cv_data.get('ocr_used_pages'):
-                        st.info(f"🔍 OCR used for pages: {', '.join(map(str, cv_data['ocr_used_pages']))}")
+                for completed, future in enumerate(as_completed(futures), start=1):
+                    idx, file = futures[future]
+                    status_text.text(f"📄 Processed {file.name}... ({completed}/{total_files})")
                     
-                    # Add delay between requests
-                    if idx < len(uploaded_cv_files) - 1:
-                        time.sleep(2.0)
+                    try:
+                        cv_data = future.result()
+                        cv_data['source_file'] = file.name
+                        results_by_idx[idx] = cv_data
+                        
+                        # Show OCR info if used
+                        if cv_data.get('ocr_used_pages'):
+                            st.info(f"🔍 OCR used for pages: {', '.join(map(str, cv_data['ocr_used_pages']))}")
+                        
+                    except Exception as e:
+                        st.error(f"❌ Error processing {file.name}: {str(e)}")
                     
-                except Exception as e:
-                    st.error(f"❌ Error processing {file.name}: {str(e)}")
-                
-                # Update progress
-                progress_bar.progress((idx + 1) / len(uploaded_cv_files))
+                    # Update progress
+                    progress_bar.progress(completed / total_files)
+            
+            # Keep results in upload order
+            results = [cv_data for cv_data in results_by_idx if cv_data is not None]
             
-            # Store results in session state (append mode)
-            if SESSION_CV_RESULTS not in st.session_state:
-                st.session_state[SESSION_CV_RESULTS] = []
-            st.session_state[SESSION_CV_RESULTS].extend(results)
+            # Store result tables in session state (append mode) - only the new CVs are flattened
+            new_summary, new_detailed = _build_result_tables(results)
+            _append_to_session_df(SESSION_CV_SUMMARY, new_summary)
+            _append_to_session_df(SESSION_CV_DETAILED, new_detailed)
             
             status_text.empty()
             progress_bar.empty()
             st.success(f"✅ Successfully processed {len(results)} candidate document(s)!")
             st.rerun()
     
-    # Display results
-    if SESSION_CV_RESULTS in st.session_state and st.session_state[SESSION_CV_RESULTS]:
+    # Display results (a fragment, so its widgets rerun only this section)
+    _render_cv_results()
+
+
+@st.fragment
+def _render_cv_results():
+    """Display extraction results and downloads."""
+    df_summary = st.session_state.get(SESSION_CV_SUMMARY)
+    if df_summary is not None and not df_summary.empty:
         st.markdown("---")
         st.markdown("## 📊 Extraction Results")
         
         # Clear button
         if st.button("🗑️ Clear All Results", use_container_width=True):
-            st.session_state[SESSION_CV_RESULTS] = []
+            st.session_state[SESSION_CV_SUMMARY] = None
+            st.session_state[SESSION_CV_DETAILED] = None
             st.rerun()
         
         st.markdown("---")
         
+        df_detailed = st.session_state.get(SESSION_CV_DETAILED)
+        if df_detailed is None:
+            df_detailed = pd.DataFrame()
+        
         # SUMMARY TABLE
         st.markdown("### 📋 Experience Summary")
-        summary_data = []
-        for cv in st.session_state[SESSION_CV_RESULTS]:
-            personal = cv.get('personal_info', {})
-            exp_cif = cv.get('experience_in_cif', {})
-            exp_resume = cv.get('experience_in_resume', {})
-            exp_letter = cv.get('experience_letter_found', {})
-            
-            summary_data.append({
-                'Name': personal.get('full_name', 'Unknown'),
-                'CNIC': personal.get('cnic', ''),
-                'Email': personal.get('email', ''),
-                'Contact': personal.get('contact', ''),
-                'Experience in CIF': 'YES' if exp_cif.get('found') else 'NO',
-                'CIF Details': exp_cif.get('details', ''),
-                'Experience in Resume': 'YES' if exp_resume.get('found') else 'NO',
-                'Resume Details': exp_resume.get('details', ''),
-                'Experience Letter Attached': 'YES' if exp_letter.get('found') else 'NO',
-                'Letter Details': exp_letter.get('details', ''),
-                'Total Experience Records': len(cv.get('all_experiences', [])),
-                'Source File': cv.get('source_file', '')
-            })
-        
-        df_summary = pd.DataFrame(summary_data)
         st.dataframe(df_summary, use_container_width=True, hide_index=True)
         
         # DETAILED EXPERIENCE TABLE
         st.markdown("### 💼 Detailed Work Experience")
-        detailed_exp = []
-        for cv in st.session_state[SESSION_CV_RESULTS]:
-            personal = cv.get('personal_info', {})
-            name = personal.get('full_name', 'Unknown')
-            cnic = personal.get('cnic', '')
-            
-            for exp in cv.get('all_experiences', []):
-                detailed_exp.append({
-                    'Name': name,
-                    'CNIC': cnic,
-                    'Source': exp.get('source', ''),
-                    'Employer': exp.get('employer', ''),
-                    'Designation/Grade': exp.get('designation', ''),
-                    'Date of Joining': exp.get('date_joining', ''),
-                    'Date of Leaving': exp.get('date_leaving', ''),
-                    'Duration (Months)': exp.get('duration_months', ''),
-                    'Monthly Salary': exp.get('monthly_salary', ''),
-                    'Responsibilities': exp.get('responsibilities', ''),
-                    'Source File': cv.get('source_file', '')
-                })
-        
-        if detailed_exp:
-            df_detailed = pd.DataFrame(detailed_exp)
+        if not df_detailed.empty:
             st.dataframe(df_detailed, use_container_width=True, hide_index=True)
         else:
             st.warning("⚠️ No experience records found in processed documents")
@@ -170,7 +234,7 @@ def experience_parser_page():
         
         with col1:
             if not df_summary.empty:
-                summary_excel = convert_df_to_excel(df_summary, "Experience Summary")
+                summary_excel = session_excel_bytes(df_summary, "cv_summary_xlsx", "Experience Summary")
                 st.download_button(
                     label="📥 Download Experience Summary",
                     data=summary_excel,
@@ -180,8 +244,8 @@ def experience_parser_page():
                 )
         
         with col2:
-            if detailed_exp:
-                detailed_excel = convert_df_to_excel(df_detailed, "Detailed Experience")
+            if not df_detailed.empty:
+                detailed_excel = session_excel_bytes(df_detailed, "cv_detailed_xlsx", "Detailed Experience")
                 st.download_button(
                     label="📥 Download Detailed Experience",
                     data=detailed_excel,
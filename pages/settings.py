@@ -4,6 +4,7 @@ API Key management and configuration
 """
 
 import streamlit as st
+import pandas as pd
 
 from utils.api_client import get_api_keys
 
@@ -24,24 +25,28 @@ def settings_page():
     # Display current keys
     st.markdown("#### Current API Keys:")
     
-    keys_to_remove = []
-    for idx, key in enumerate(st.session_state['groq_api_keys']):
-        col1, col2 = st.columns([4, 1])
-        with col1:
-            masked_key = f"{key[:10]}...{key[-8:]}" if key and len(key) > 18 else "Empty"
-            st.text_input(
-                f"API Key {idx + 1}",
-                value=masked_key,
-                disabled=True,
-                key=f"key_display_{idx}"
-            )
-        with col2:
-            if st.button("🗑️", key=f"remove_{idx}"):
-                keys_to_remove.append(idx)
+    # One data editor for all keys; deleting rows removes the keys.
+    # The editor key is versioned so its delete state resets after each change.
+    keys = st.session_state['groq_api_keys']
+    keys_series = pd.Series(keys, dtype=object).fillna('')
+    masked_keys = (keys_series.str[:10] + '...' + keys_series.str[-8:]).where(
+        keys_series.str.len() > 18, 'Empty'
+    )
+    editor_version = st.session_state.setdefault('api_keys_editor_version', 0)
+    edited = st.data_editor(
+        pd.DataFrame({'API Key': masked_keys}),
+        num_rows="dynamic",
+        disabled=['API Key'],
+        hide_index=True,
+        use_container_width=True,
+        key=f"api_keys_editor_{editor_version}"
+    )
     
-    # Remove keys marked for deletion
-    for idx in reversed(keys_to_remove):
-        st.session_state['groq_api_keys'].pop(idx)
+    # Remove keys whose rows were deleted (rows added in the editor are ignored)
+    kept_rows = set(edited.index)
+    if len(kept_rows.intersection(range(len(keys)))) < len(keys):
+        st.session_state['groq_api_keys'] = [key for idx, key in enumerate(keys) if idx in kept_rows]
+        st.session_state['api_keys_editor_version'] = editor_version + 1
         st.rerun()
     
     # Add new key
@@ -5,11 +5,97 @@ Merge employee data with education records using exact, fuzzy, and AI matching
 
 import streamlit as st
 import pandas as pd
-import time
+import numpy as np
+from io import BytesIO
+from concurrent.futures import as_completed
 
-from utils.api_client import get_api_keys, create_groq_client_with_fallback
+from config import CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS
+from utils.api_client import get_api_keys, create_groq_client_with_fallback, thread_pool_with_script_ctx
 from utils.excel_export import convert_df_to_excel
-from extractors.spreadsheet_matcher import ai_match_names, normalize_name, fuzzy_match_names
+from extractors.spreadsheet_matcher import (
+    ai_match_names, normalize_names, fuzzy_match_names, assign_employee_matches
+)
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def _read_uploaded_table(file_bytes: bytes, file_name: str) -> pd.DataFrame:
+    """Read CSV/Excel upload bytes into a DataFrame. Cached so each upload is parsed once."""
+    if file_name.endswith('.csv'):
+        return pd.read_csv(BytesIO(file_bytes))
+    
+    # Rust-backed calamine parser is much faster than openpyxl; fall back if not installed
+    try:
+        return pd.read_excel(BytesIO(file_bytes), engine='calamine')
+    except ImportError:
+        return pd.read_excel(BytesIO(file_bytes))
+
+
+def _add_normalized_names(df: pd.DataFrame, name_column: str) -> pd.DataFrame:
+    """Add a 'name_normalized' column (vectorized over the whole column)."""
+    df['name_normalized'] = normalize_names(df[name_column])
+    return df
+
+
+def _sort_by_person_and_start_date(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sort records by CNIC, then by Degree Start Date, with missing values last.
+    CNICs are integer-coded once so the sort is a stable lexsort on integers
+    instead of an object-dtype multi-column sort.
+    """
+    cnic_codes, cnic_uniques = pd.factorize(df['CNIC'], sort=True)
+    cnic_codes = np.where(cnic_codes == -1, len(cnic_uniques), cnic_codes)
+    
+    # np.lexsort treats the last key as the primary one
+    sort_keys = [cnic_codes]
+    if 'Degree Start Date' in df.columns:
+        start_dates = df['Degree Start Date']
+        sort_keys = [start_dates.to_numpy().view('int64'), start_dates.isna().to_numpy(), cnic_codes]
+    
+    return df.iloc[np.lexsort(sort_keys)].reset_index(drop=True)
+
+
+def _format_dates_mdy(dates: pd.Series) -> pd.Series:
+    """
+    Format datetimes as M/D/YYYY without leading zeros, leaving missing dates as NaT.
+    Built from the integer date parts with vectorized string concatenation,
+    since strftime's '%-m' is not supported on Windows.
+    """
+    parts = [dates.dt.month, dates.dt.day, dates.dt.year]
+    month, day, year = (part.astype('Int64').astype('string') for part in parts)
+    formatted = month + '/' + day + '/' + year
+    return formatted.astype(object).where(dates.notna(), pd.NaT)
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def _prepare_employee_data(file_bytes: bytes, file_name: str) -> pd.DataFrame:
+    """
+    Load employee data, normalize names and drop duplicate employees.
+    Cached on the uploaded bytes so reruns skip the normalize-and-dedupe pass.
+    """
+    emp_df = _read_uploaded_table(file_bytes, file_name)
+    emp_df.columns = emp_df.columns.str.strip().str.upper()
+    
+    if 'FULL_NAME' not in emp_df.columns:
+        return emp_df
+    
+    # Remove duplicates from employee data (keep first occurrence)
+    emp_df = _add_normalized_names(emp_df, 'FULL_NAME')
+    return emp_df.drop_duplicates(subset=['name_normalized'], keep='first')
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def _prepare_education_data(file_bytes: bytes, file_name: str) -> pd.DataFrame:
+    """
+    Load education data and normalize names.
+    Cached on the uploaded bytes so reruns skip the normalization pass.
+    """
+    edu_df = _read_uploaded_table(file_bytes, file_name)
+    edu_df.columns = edu_df.columns.str.strip().str.title()
+    
+    if 'Name' not in edu_df.columns:
+        return edu_df
+    
+    return _add_normalized_names(edu_df, 'Name')
 
 
 def spreadsheet_loader_page():
@@ -30,12 +116,11 @@ def spreadsheet_loader_page():
             help="Excel file with columns: CNIC, EMPLOYEE_NUMBER, FULL_NAME"
         )
         
+        # Upload bytes are copied out once and reused by the preview and the merge
+        employee_bytes = employee_file.getvalue() if employee_file else None
         if employee_file:
             try:
-                if employee_file.name.endswith('.csv'):
-                    emp_df = pd.read_csv(employee_file)
-                else:
-                    emp_df = pd.read_excel(employee_file)
+                emp_df = _read_uploaded_table(employee_bytes, employee_file.name)
                 
                 st.success(f"✅ Loaded {len(emp_df)} employee records")
                 st.dataframe(emp_df.head(3), use_container_width=True)
@@ -52,12 +137,10 @@ def spreadsheet_loader_page():
             help="Excel file with education records (must have 'Name' column)"
         )
         
+        education_bytes = education_file.getvalue() if education_file else None
         if education_file:
             try:
-                if education_file.name.endswith('.csv'):
-                    edu_df = pd.read_csv(education_file)
-                else:
-                    edu_df = pd.read_excel(education_file)
+                edu_df = _read_uploaded_table(education_bytes, education_file.name)
                 
                 st.success(f"✅ Loaded {len(edu_df)} education records")
                 st.dataframe(edu_df.head(3), use_container_width=True)
@@ -78,28 +161,17 @@ def spreadsheet_loader_page():
     
     if merge_button and employee_file and education_file:
         try:
-            # Load dataframes
-            if employee_file.name.endswith('.csv'):
-                emp_df = pd.read_csv(employee_file)
-            else:
-                emp_df = pd.read_excel(employee_file)
-            
-            if education_file.name.endswith('.csv'):
-                edu_df = pd.read_csv(education_file)
-            else:
-                edu_df = pd.read_excel(education_file)
-            
-            # Normalize column names (case-insensitive)
-            emp_df.columns = emp_df.columns.str.strip().str.upper()
-            edu_df.columns = edu_df.columns.str.strip().str.title()
+            # Load dataframes with normalized column and employee names (cached on file bytes)
+            emp_df_unique = _prepare_employee_data(employee_bytes, employee_file.name)
+            edu_df = _prepare_education_data(education_bytes, education_file.name)
             
             # Check required columns
             required_emp_cols = ['CNIC', 'EMPLOYEE_NUMBER', 'FULL_NAME']
-            missing_emp = [col for col in required_emp_cols if col not in emp_df.columns]
+            missing_emp = [col for col in required_emp_cols if col not in emp_df_unique.columns]
             
             if missing_emp:
                 st.error(f"❌ Employee file missing columns: {', '.join(missing_emp)}")
-                st.info(f"Available columns: {', '.join(emp_df.columns)}")
+                st.info(f"Available columns: {', '.join(emp_df_unique.columns)}")
                 return
             
             if 'Name' not in edu_df.columns:
@@ -111,18 +183,20 @@ def spreadsheet_loader_page():
             api_keys = get_api_keys()
             has_api_keys = any(k for k in api_keys)
             
-            # Normalize names for matching using robust normalization
-            emp_df['name_normalized'] = emp_df['FULL_NAME'].apply(normalize_name)
-            edu_df['name_normalized'] = edu_df['Name'].apply(normalize_name)
-            
-            # Remove duplicates from employee data (keep first occurrence)
-            emp_df_unique = emp_df.drop_duplicates(subset=['name_normalized'], keep='first')
-            
-            # First try exact matching
-            merged_df = edu_df.merge(
-                emp_df_unique[['CNIC', 'EMPLOYEE_NUMBER', 'FULL_NAME', 'name_normalized']],
-                on='name_normalized',
-                how='left'
+            # First try exact matching on the normalized names, factorized together.
+            # Employee names are unique and come first, so an education name's code is
+            # the position of its employee (codes past the employees have no match) -
+            # the left join becomes a positional lookup with no second hash pass
+            name_codes, _ = pd.factorize(
+                pd.concat([emp_df_unique['name_normalized'], edu_df['name_normalized']], ignore_index=True)
+            )
+            emp_count = len(emp_df_unique)
+            edu_codes = name_codes[emp_count:]
+            emp_matches = emp_df_unique[['CNIC', 'EMPLOYEE_NUMBER', 'FULL_NAME']].reset_index(drop=True).reindex(
+                np.where(edu_codes < emp_count, edu_codes, -1)
+            )
+            merged_df = pd.concat(
+                [edu_df.reset_index(drop=True), emp_matches.reset_index(drop=True)], axis=1
             )
             
             # Find unmatched records for fuzzy matching
@@ -151,33 +225,58 @@ def spreadsheet_loader_page():
                 # AI matching in batches of 20 to avoid token limits
                 ai_matches = {}
                 batch_size = 20
+                batches = [
+                    unmatched_edu_names[i:i+batch_size]
+                    for i in range(0, len(unmatched_edu_names), batch_size)
+                ]
                 progress_bar = st.progress(0)
                 
-                for i in range(0, len(unmatched_edu_names), batch_size):
-                    batch = unmatched_edu_names[i:i+batch_size]
-                    # Use fallback keys for AI matching
-                    batch_matches = create_groq_client_with_fallback(api_keys, ai_match_names, batch, emp_names_list)
-                    ai_matches.update(batch_matches)
-                    progress_bar.progress(min((i + batch_size) / len(unmatched_edu_names), 1.0))
-                    time.sleep(0.5)  # Rate limiting
+                # Run batches concurrently - each call is dominated by Groq HTTP latency
+                active_key_count = len([k for k in api_keys if k])
+                
+                def match_batch(batch):
+                    # The shared key pool hands concurrent workers different keys round-robin;
+                    # every Groq request they make waits on its key's shared rate limiter
+                    return create_groq_client_with_fallback(api_keys, ai_match_names, batch, emp_names_list)
+                
+                max_workers = min(len(batches), active_key_count * 2, 8)
+                with thread_pool_with_script_ctx(max_workers) as executor:
+                    futures = [executor.submit(match_batch, batch) for batch in batches]
+                    
+                    for completed, future in enumerate(as_completed(futures), start=1):
+                        try:
+                            ai_matches.update(future.result())
+                        except Exception as e:
+                            st.warning(f"⚠️ AI matching failed for one batch: {str(e)}")
+                        progress_bar.progress(completed / len(batches))
                 
                 progress_bar.empty()
                 
-                # Apply AI matches
-                ai_matched_count = 0
-                for edu_name, emp_match in ai_matches.items():
-                    if emp_match:
-                        emp_match_normalized = normalize_name(emp_match)
-                        if emp_match_normalized in emp_df_unique['name_normalized'].values:
-                            # Find the employee record
-                            emp_row = emp_df_unique[emp_df_unique['name_normalized'] == emp_match_normalized].iloc[0]
-                        
-                            # Update the merged dataframe
-                            mask = (merged_df['Name'] == edu_name) & (merged_df['CNIC'].isna())
-                            merged_df.loc[mask, 'CNIC'] = emp_row['CNIC']
-                            merged_df.loc[mask, 'EMPLOYEE_NUMBER'] = emp_row['EMPLOYEE_NUMBER']
-                            merged_df.loc[mask, 'FULL_NAME'] = emp_row['FULL_NAME']
-                            ai_matched_count += mask.sum()
+                # Lookups built once: employee position by normalized name,
+                # and merged_df row positions by education name
+                emp_pos_by_name = dict(zip(emp_df_unique['name_normalized'], range(len(emp_df_unique))))
+                edu_rows_by_name = merged_df.groupby('Name', sort=False).indices
+                still_unmatched = merged_df['CNIC'].isna().to_numpy()
+                
+                # Normalize every AI-proposed employee name in one vectorized pass
+                ai_match_series = pd.Series(ai_matches, dtype=object)
+                ai_match_series = normalize_names(ai_match_series[ai_match_series.astype(bool)])
+                
+                # Apply AI matches (collected first, then assigned in one bulk update)
+                ai_row_indices = []
+                ai_emp_positions = []
+                for edu_name, emp_match_normalized in ai_match_series.items():
+                    if emp_match_normalized:
+                        emp_pos = emp_pos_by_name.get(emp_match_normalized)
+                        row_positions = edu_rows_by_name.get(edu_name)
+                        if emp_pos is not None and row_positions is not None:
+                            # Unmatched rows for this education name
+                            row_positions = row_positions[still_unmatched[row_positions]]
+                            ai_row_indices.extend(merged_df.index[row_positions])
+                            ai_emp_positions.extend([emp_pos] * len(row_positions))
+                
+                merged_df = assign_employee_matches(merged_df, ai_row_indices, emp_df_unique, ai_emp_positions)
+                ai_matched_count = len(ai_row_indices)
                 
                 if ai_matched_count > 0:
                     st.success(f"✨ AI matched {ai_matched_count} additional records!")
@@ -203,9 +302,11 @@ def spreadsheet_loader_page():
             ]
             
             # Only include columns that exist
-            existing_final_cols = [col for col in final_columns if col in merged_df.columns]
-            other_cols = [col for col in merged_df.columns if col not in final_columns]
-            merged_df = merged_df[existing_final_cols + other_cols]
+            final_columns_set = set(final_columns)
+            merged_columns_set = set(merged_df.columns)
+            existing_final_cols = [col for col in final_columns if col in merged_columns_set]
+            other_cols = [col for col in merged_df.columns if col not in final_columns_set]
+            merged_df = merged_df.reindex(columns=existing_final_cols + other_cols, copy=False)
             
             # Rename columns to match Oracle format
             column_mapping = {
@@ -223,26 +324,18 @@ def spreadsheet_loader_page():
                 merged_df['Degree End Date'] = pd.to_datetime(merged_df['Degree End Date'], errors='coerce')
             
             # Sort by CNIC (to group each person together) and then by Degree Start Date (chronological order)
-            sort_columns = ['CNIC']
-            if 'Degree Start Date' in merged_df.columns:
-                sort_columns.append('Degree Start Date')
-            merged_df = merged_df.sort_values(by=sort_columns, na_position='last').reset_index(drop=True)
+            merged_df = _sort_by_person_and_start_date(merged_df)
             
             # Convert dates back to M/D/YYYY format (without time) - cross-platform compatible
-            def format_date(date_val):
-                """Format datetime to M/D/YYYY without leading zeros"""
-                if pd.isna(date_val):
-                    return date_val
-                return f"{date_val.month}/{date_val.day}/{date_val.year}"
-            
             if 'Degree Start Date' in merged_df.columns:
-                merged_df['Degree Start Date'] = merged_df['Degree Start Date'].apply(format_date)
+                merged_df['Degree Start Date'] = _format_dates_mdy(merged_df['Degree Start Date'])
             if 'Degree End Date' in merged_df.columns:
-                merged_df['Degree End Date'] = merged_df['Degree End Date'].apply(format_date)
+                merged_df['Degree End Date'] = _format_dates_mdy(merged_df['Degree End Date'])
             
             # Check for unmatched records
-            unmatched = merged_df[merged_df['CNIC'].isna()]
-            matched = merged_df[merged_df['CNIC'].notna()]
+            unmatched_mask = merged_df['CNIC'].isna()
+            unmatched = merged_df[unmatched_mask]
+            matched_count = len(merged_df) - int(unmatched_mask.sum())
             
             # Display results
             st.markdown("---")
@@ -252,7 +345,7 @@ def spreadsheet_loader_page():
             with col1:
                 st.metric("Total Records", len(merged_df))
             with col2:
-                st.metric("Matched", len(matched))
+                st.metric("Matched", matched_count)
             with col3:
                 st.metric("Unmatched", len(unmatched))
             
@@ -0,0 +1,44 @@
+"""
+Tests for fuzzy employee/education name matching
+"""
+
+import pandas as pd
+import pytest
+
+from extractors.spreadsheet_matcher import EMPLOYEE_MATCH_COLUMNS, fuzzy_match_names
+
+
+def _match(edu_name: str, emp_name: str):
+    """Run fuzzy_match_names for one education row against one employee."""
+    emp_df_unique = pd.DataFrame({
+        'name_normalized': [emp_name],
+        'CNIC': ['3520212345671'],
+        'EMPLOYEE_NUMBER': ['1001'],
+        'FULL_NAME': [emp_name.title()],
+    })
+    merged_df = pd.DataFrame({'name_normalized': [edu_name]})
+    for column in EMPLOYEE_MATCH_COLUMNS:
+        merged_df[column] = pd.Series([None], dtype=object)
+    unmatched_mask = merged_df['CNIC'].isna()
+    return fuzzy_match_names(merged_df, emp_df_unique, unmatched_mask)
+
+
+@pytest.mark.parametrize('edu_name, emp_name', [
+    ('muhammad asif', 'muhammad arif'),
+    ('syed ali raza', 'syed ali reza'),
+    ('ahmed khan', 'ahmad khan'),
+])
+def test_one_letter_differences_are_not_matched(edu_name, emp_name):
+    merged_df, matched_count = _match(edu_name, emp_name)
+    assert matched_count == 0
+    assert merged_df['CNIC'].isna().all()
+
+
+@pytest.mark.parametrize('edu_name, emp_name', [
+    ('mohammad ali', 'muhammad ali'),
+    ('ali mohammed khan', 'muhammad ali khan'),
+])
+def test_transliteration_aliases_are_matched(edu_name, emp_name):
+    merged_df, matched_count = _match(edu_name, emp_name)
+    assert matched_count == 1
+    assert merged_df.loc[0, 'CNIC'] == '3520212345671'
@@ -2,9 +2,18 @@
 API Client Management - Groq API with automatic fallback support
 """
 import streamlit as st
-from groq import Groq
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from groq import Groq, RateLimitError
 import os
-from config import ENV_API_KEY_PRIMARY, ENV_API_KEY_2, ENV_API_KEY_3, SESSION_API_KEYS
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    ENV_API_KEY_PRIMARY, ENV_API_KEY_2, ENV_API_KEY_3, SESSION_API_KEYS,
+    RATE_LIMIT_COOLDOWN_SECONDS, GROQ_REQUESTS_PER_MINUTE
+)
 
 
 def get_api_keys():
@@ -19,22 +28,238 @@ def get_api_keys():
         keys.extend(st.session_state[SESSION_API_KEYS])
     
     # Additional keys from environment variables
-    env_keys = [
+    for key in _get_env_api_keys():
+        if key and key not in keys:
+            keys.append(key)
+    
+    return keys[:5]  # Limit to 5 keys
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _get_env_api_keys() -> list:
+    """
+    Read API keys from environment variables.
+    Cached briefly so reruns don't re-read the environment; session keys are
+    per-user and are never cached here.
+    """
+    return [
         os.getenv(ENV_API_KEY_PRIMARY),
         os.getenv(ENV_API_KEY_2),
         os.getenv(ENV_API_KEY_3)
     ]
+
+
+@st.cache_resource(show_spinner=False)
+def get_groq_client(api_key: str) -> Groq:
+    """
+    Get a shared Groq client for an API key.
+    Cached across reruns so the underlying HTTP connection pool is reused.
+    """
+    return Groq(api_key=api_key)
+
+
+def stream_completion_text(client, **request_kwargs) -> str:
+    """
+    Run a streamed chat completion and return the full response text.
+    Tokens are accumulated as they arrive instead of blocking on the complete response.
+    Every request first takes a slot from its key's shared rate limiter, so multi-call
+    operations (e.g. a CV's structure, personal-info and section calls) are all counted.
     
-    for key in env_keys:
-        if key and key not in keys:
-            keys.append(key)
+    Args:
+        client: Groq client instance
+        **request_kwargs: Arguments for client.chat.completions.create
     
-    return keys[:5]  # Limit to 5 keys
+    Returns:
+        str: Concatenated response content
+    """
+    get_key_rate_limiter(client.api_key).acquire()
+    stream = client.chat.completions.create(stream=True, **request_kwargs)
+    chunks = []
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            chunks.append(chunk.choices[0].delta.content)
+    return "".join(chunks)
+
+
+def thread_pool_with_script_ctx(max_workers: int) -> ThreadPoolExecutor:
+    """
+    ThreadPoolExecutor whose worker threads carry the calling page's ScriptRunContext,
+    so st.* messages raised in workers (e.g. key-fallback warnings) reach the page
+    instead of being dropped.
+    """
+    return ThreadPoolExecutor(
+        max_workers=max_workers,
+        initializer=add_script_run_ctx,
+        initargs=(None, get_script_run_ctx())
+    )
+
+
+def rotate_api_keys(api_keys, offset: int) -> list:
+    """
+    Rotate the key list so it starts at `offset` (modulo its length).
+    Lets concurrent workers start on different keys while keeping the rest as fallbacks.
+    """
+    if not api_keys:
+        return []
+    offset %= len(api_keys)
+    return list(api_keys[offset:]) + list(api_keys[:offset])
+
+
+class RateLimiter:
+    """
+    Thread-safe sliding-window rate limiter.
+    Blocks callers so that at most `max_calls` start within any `period` seconds.
+    """
+    
+    def __init__(self, max_calls: int, period: float = 60.0):
+        self.max_calls = max(1, max_calls)
+        self.period = period
+        self._lock = threading.Lock()
+        self._timestamps = deque()
+    
+    def acquire(self):
+        """Block until a call slot is available, then claim it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._timestamps and now - self._timestamps[0] >= self.period:
+                    self._timestamps.popleft()
+                
+                if len(self._timestamps) < self.max_calls:
+                    self._timestamps.append(now)
+                    return
+                
+                wait_time = self.period - (now - self._timestamps[0])
+            
+            time.sleep(wait_time)
+
+
+class ApiKeyPool:
+    """
+    Round-robin pool of API keys with per-key rate-limit state.
+    Rate-limited keys are parked until their Retry-After window passes;
+    keys rejected as unauthorized are skipped until the server restarts. The pool
+    is a cache_resource, so this state is shared by every session using the same keys.
+    """
+    
+    def __init__(self, api_keys):
+        self._keys = list(api_keys)
+        self._cooldown_until = {key: 0.0 for key in self._keys}
+        self._errored = set()
+        self.auth_error = None
+        self._next_idx = 0
+        self._lock = threading.Lock()
+    
+    def ordered_keys(self) -> list:
+        """
+        Keys to try for the next call, starting at the next round-robin position.
+        Keys still cooling down are skipped (they would only return another 429);
+        if every key is cooling down, the soonest-available one is returned.
+        """
+        with self._lock:
+            if not self._keys:
+                return []
+            
+            now = time.monotonic()
+            rotated = rotate_api_keys(self._keys, self._next_idx)
+            self._next_idx = (self._next_idx + 1) % len(self._keys)
+            
+            usable = [key for key in rotated if key not in self._errored]
+            available = [key for key in usable if self._cooldown_until[key] <= now]
+            if available:
+                return available
+            
+            return sorted(usable, key=self._cooldown_until.get)[:1]
+    
+    def mark_rate_limited(self, key: str, retry_after: float):
+        """Park a key until its rate-limit window has passed."""
+        with self._lock:
+            self._cooldown_until[key] = time.monotonic() + retry_after
+    
+    def mark_errored(self, key: str, error: Exception):
+        """Stop using a key rejected as unauthorized, keeping the error to report later."""
+        with self._lock:
+            self._errored.add(key)
+            self.auth_error = error
+
+
+@st.cache_resource(show_spinner=False)
+def get_api_key_pool(api_keys: tuple) -> ApiKeyPool:
+    """Get the shared key pool for a set of API keys (survives reruns)."""
+    return ApiKeyPool(api_keys)
+
+
+@st.cache_resource(show_spinner=False)
+def get_key_rate_limiter(api_key: str) -> RateLimiter:
+    """
+    Get the rate limiter for one API key, shared by every page and session (survives reruns).
+    Allows GROQ_REQUESTS_PER_MINUTE, so concurrent runs draw from one per-key budget.
+    """
+    return RateLimiter(GROQ_REQUESTS_PER_MINUTE)
+
+
+# Rate-limit markers in API error messages
+_RATE_LIMIT_RE = re.compile(r"rate[_ ]?limit|\b429\b|quota", re.IGNORECASE)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Check whether an API error is a rate-limit/quota error."""
+    return isinstance(error, RateLimitError) or _RATE_LIMIT_RE.search(str(error)) is not None
+
+
+def _error_status_code(error: Exception):
+    """HTTP status code of an API error, if the exception carries one."""
+    return getattr(error, "status_code", None)
+
+
+# Groq rate-limit reset durations, e.g. "2m59.56s", "7.66s", "450ms"
+_RESET_DURATION_RE = re.compile(r"^(?:(\d+)h)?(?:(\d+)m(?!s))?(?:([\d.]+)s)?(?:([\d.]+)ms)?$")
+
+
+def _parse_reset_duration(value: str):
+    """Parse a Groq x-ratelimit-reset-* header value into seconds (None if unparseable)."""
+    match = _RESET_DURATION_RE.match(value.strip())
+    if not match or not any(match.groups()):
+        return None
+    hours, minutes, seconds, millis = (float(part) if part else 0.0 for part in match.groups())
+    return hours * 3600 + minutes * 60 + seconds + millis / 1000
+
+
+def retry_after_seconds(error: Exception):
+    """
+    Seconds the server asks us to wait after a rate-limit error.
+    Reads Retry-After, then Groq's x-ratelimit-reset-requests / -tokens headers.
+    
+    Returns:
+        float or None if the error carries no usable header
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        pass
+    
+    resets = [
+        _parse_reset_duration(headers[name])
+        for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+        if headers.get(name)
+    ]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+def _retry_after_seconds(error: Exception) -> float:
+    """Server-requested wait for a rate-limit error, defaulting to the cooldown setting."""
+    wait_time = retry_after_seconds(error)
+    return RATE_LIMIT_COOLDOWN_SECONDS if wait_time is None else wait_time
 
 
 def create_groq_client_with_fallback(api_keys, operation_func, *args, **kwargs):
     """
     Create Groq client and execute operation with automatic key fallback on rate limits.
+    Keys are taken round-robin from a shared ApiKeyPool so load spreads across all keys.
     
     Args:
         api_keys: List of API keys to try
@@ -47,25 +272,36 @@ def create_groq_client_with_fallback(api_keys, operation_func, *args, **kwargs):
     Raises:
         Last encountered error if all keys fail
     """
+    api_keys = [key for key in api_keys if key]
     if not api_keys:
         raise ValueError("No API keys provided")
     
+    pool = get_api_key_pool(tuple(sorted(set(api_keys))))
+    keys_to_try = pool.ordered_keys()
+    if not keys_to_try and pool.auth_error is not None:
+        # Every key was already rejected as unauthorized - report the real auth error
+        raise pool.auth_error
     last_error = None
     
-    for idx, key in enumerate(api_keys):
+    for idx, key in enumerate(keys_to_try):
         try:
-            client = Groq(api_key=key)
+            client = get_groq_client(key)
             # Execute the operation with this client
             result = operation_func(client, *args, **kwargs)
             return result
             
         except Exception as e:
-            error_msg = str(e)
+            # Invalid key - drop it from the pool and try the next one
+            if _error_status_code(e) == 401:
+                pool.mark_errored(key, e)
+                last_error = e
+                continue
             
             # Check if it's a rate limit error
-            if "rate_limit" in error_msg.lower() or "429" in error_msg or "quota" in error_msg.lower():
-                if idx < len(api_keys) - 1:  # If there are more keys to try
-                    st.warning(f"⚠️ API Key {idx + 1} hit rate limit. Switching to fallback key {idx + 2}...")
+            if is_rate_limit_error(e):
+                pool.mark_rate_limited(key, _retry_after_seconds(e))
+                if idx < len(keys_to_try) - 1:  # If there are more keys to try
+                    st.warning(f"⚠️ API Key ...{key[-4:]} hit rate limit. Switching to a fallback key...")
                     last_error = e
                     continue
                 else:
@@ -75,7 +311,7 @@ def create_groq_client_with_fallback(api_keys, operation_func, *args, **kwargs):
                 # Not a rate limit error, raise it
                 raise
     
-    # If we get here, all keys failed with rate limits
+    # If we get here, all keys failed
     if last_error:
         raise last_error
     raise ValueError("Failed to execute operation with any API key")
@@ -2,12 +2,16 @@
 Excel Export Utilities
 """
 import pandas as pd
+import streamlit as st
 from io import BytesIO
+from config import CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS
 
 
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, show_spinner=False)
 def convert_df_to_excel(df: pd.DataFrame, sheet_name: str = "Data") -> bytes:
     """
     Convert DataFrame to Excel bytes for download.
+    Cached so reruns don't re-serialize an unchanged DataFrame.
     
     Args:
         df: pandas DataFrame
@@ -17,6 +21,35 @@ def convert_df_to_excel(df: pd.DataFrame, sheet_name: str = "Data") -> bytes:
         bytes: Excel file as bytes
     """
     output = BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+    # strings_to_urls=False skips xlsxwriter's per-cell URL regex check.
+    # constant_memory is not usable: pandas writes cells column by column.
+    with pd.ExcelWriter(
+        output,
+        engine="xlsxwriter",
+        engine_kwargs={"options": {"strings_to_urls": False}},
+    ) as writer:
         df.to_excel(writer, index=False, sheet_name=sheet_name)
     return output.getvalue()
+
+
+def session_excel_bytes(df: pd.DataFrame, cache_key: str, sheet_name: str = "Data") -> bytes:
+    """
+    Excel bytes for a DataFrame held in session state.
+    While the same DataFrame object is passed on later reruns, the stored bytes
+    are returned without hashing the DataFrame for the cache_data lookup.
+    
+    Args:
+        df: pandas DataFrame (the object kept in st.session_state)
+        cache_key: Session state key to store the bytes under
+        sheet_name: Name for the Excel sheet
+    
+    Returns:
+        bytes: Excel file as bytes
+    """
+    stored = st.session_state.get(cache_key)
+    if stored is not None and stored[0] is df:
+        return stored[1]
+    
+    excel_bytes = convert_df_to_excel(df, sheet_name)
+    st.session_state[cache_key] = (df, excel_bytes)
+    return excel_bytes
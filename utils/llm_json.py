@@ -0,0 +1,55 @@
+"""
+LLM Response Parsing - JSON extraction from model responses
+"""
+import json
+import re
+
+# Fast JSON parsing (optional)
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Content of a markdown code fence (```json ... ``` or ``` ... ```)
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.S)
+
+
+def parse_llm_json(text: str):
+    """
+    Parse JSON from a model response, stripping a markdown code fence if present.
+    
+    Args:
+        text: Raw response text
+    
+    Returns:
+        Parsed JSON value
+    
+    Raises:
+        json.JSONDecodeError: If the response is not valid JSON
+    """
+    fence_match = _FENCE_RE.search(text)
+    if fence_match:
+        text = fence_match.group(1)
+    return _json_loads(text.strip())
+
+
+def parse_llm_json_object(text: str) -> dict:
+    """
+    Parse the outermost JSON object in a model response, ignoring any text around it.
+    
+    Args:
+        text: Raw response text
+    
+    Returns:
+        dict: Parsed JSON object
+    
+    Raises:
+        ValueError: If the response contains no JSON object (json.JSONDecodeError
+            and orjson.JSONDecodeError are ValueError subclasses)
+    """
+    start = text.find('{')
+    end = text.rfind('}') + 1
+    if start == -1 or end <= start:
+        raise ValueError("No JSON object found in response")
+    return _json_loads(text[start:end])
@@ -1,9 +1,17 @@
 """
 PDF Processing with OCR support
 """
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import fitz  # PyMuPDF
-from PIL import ImageFile
-from config import OCR_DPI, OCR_MIN_TEXT_LENGTH, OCR_LANGUAGE
+from PIL import Image, ImageFile
+from config import (
+    OCR_DPI, OCR_DPI_STANDARD_PAGE, OCR_STANDARD_PAGE_AREA, OCR_TESSERACT_CONFIG,
+    OCR_MIN_TEXT_LENGTH, OCR_LANGUAGE, PDF_STORE_MAX_BYTES
+)
 
 # Allow loading of truncated images
 ImageFile.LOAD_TRUNCATED_IMAGES = True
@@ -11,77 +19,196 @@ ImageFile.LOAD_TRUNCATED_IMAGES = True
 # OCR imports (optional)
 try:
     import pytesseract
-    from pdf2image import convert_from_bytes
     OCR_AVAILABLE = True
 except ImportError:
     OCR_AVAILABLE = False
 
+# OCR worker processes (leave one core for the app)
+OCR_MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
 
-def extract_text_with_ocr(page, page_num: int, pdf_bytes: bytes) -> tuple:
+# One OCR pool at a time: it already uses every spare core, and concurrent CVs
+# would otherwise each start their own set of worker processes
+_OCR_POOL_LOCK = threading.Lock()
+
+# PDF opened once per OCR worker process (set by _init_ocr_worker)
+_worker_document = None
+
+
+def shrink_pdf_store():
+    """
+    Empty the PyMuPDF object store (fonts, images, pixmaps) once it grows past
+    PDF_STORE_MAX_BYTES. The Streamlit process is long-lived, so the store would
+    otherwise keep the resources of every closed document.
+    """
+    if fitz.TOOLS.store_size > PDF_STORE_MAX_BYTES:
+        fitz.TOOLS.store_shrink(100)
+
+
+def _otsu_threshold(gray) -> int:
+    """
+    Otsu's global threshold for an 8-bit grayscale image (vectorized over the histogram).
+    
+    Args:
+        gray: 2-D uint8 numpy array
+    
+    Returns:
+        int: Threshold; pixels above it are background
+    """
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    class_weight = np.cumsum(hist)
+    class_sum = np.cumsum(hist * np.arange(256))
+    total_weight = class_weight[-1]
+    total_sum = class_sum[-1]
+    
+    # Between-class variance for every candidate threshold
+    other_weight = total_weight - class_weight
+    denominator = class_weight * other_weight
+    numerator = (total_sum * class_weight / total_weight - class_sum) ** 2
+    between_variance = np.divide(numerator, denominator, out=np.zeros(256), where=denominator > 0)
+    return int(between_variance.argmax())
+
+
+def _ocr_fitz_page(page) -> str:
     """
-    Extract text from PDF page with OCR fallback for scanned documents.
+    Render a PyMuPDF page in-process and OCR it.
+    Letter/A4-sized pages render at OCR_DPI_STANDARD_PAGE; larger pages at OCR_DPI.
+    Tesseract runtime grows with the pixel count, so this roughly halves OCR time.
     
     Args:
         page: PyMuPDF page object
+    
+    Returns:
+        str: OCR text, or "" if OCR failed
+    """
+    try:
+        # Render straight to grayscale (a third of the RGB buffer), then binarize
+        page_area = page.rect.width * page.rect.height
+        dpi = OCR_DPI_STANDARD_PAGE if page_area <= OCR_STANDARD_PAGE_AREA else OCR_DPI
+        zoom = dpi / 72
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+        gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+        binary = np.where(gray > _otsu_threshold(gray), 255, 0).astype(np.uint8)
+        pix = None
+        return pytesseract.image_to_string(
+            Image.fromarray(binary), lang=OCR_LANGUAGE, config=OCR_TESSERACT_CONFIG
+        )
+    except Exception:
+        # OCR failed, caller keeps the original text
+        return ""
+
+
+def ocr_page(pdf_bytes: bytes, page_num: int) -> str:
+    """
+    OCR a single PDF page in the calling process.
+    
+    Args:
+        pdf_bytes: PDF file bytes
         page_num: Page number (0-indexed)
+    
+    Returns:
+        str: OCR text, or "" if OCR failed
+    """
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        return _ocr_fitz_page(pdf_document[page_num])
+
+
+def _init_ocr_worker(pdf_bytes: bytes):
+    """Process-pool initializer: receive the PDF once and keep it open for every page task."""
+    global _worker_document
+    _worker_document = fitz.open(stream=pdf_bytes, filetype="pdf")
+
+
+def _ocr_worker_page(page_num: int) -> str:
+    """OCR one page of the worker's document (opened by _init_ocr_worker)."""
+    return _ocr_fitz_page(_worker_document[page_num])
+
+
+def read_embedded_text(pdf_bytes: bytes) -> list:
+    """
+    Read the embedded text layer of every PDF page (no OCR).
+    
+    Args:
         pdf_bytes: PDF file bytes
     
     Returns:
-        tuple: (extracted_text, used_ocr: bool)
+        list[str]: Text per page
     """
-    # Try normal text extraction first
-    text = page.get_text()
-    
-    # If text is too short (likely scanned image), use OCR
-    if len(text.strip()) < OCR_MIN_TEXT_LENGTH and OCR_AVAILABLE:
-        try:
-            # Convert specific page to image
-            images = convert_from_bytes(
-                pdf_bytes, 
-                first_page=page_num+1, 
-                last_page=page_num+1, 
-                dpi=OCR_DPI
-            )
-            if images:
-                # Perform OCR
-                ocr_text = pytesseract.image_to_string(images[0], lang=OCR_LANGUAGE)
-                if len(ocr_text.strip()) > len(text.strip()):
-                    return ocr_text, True
-        except Exception:
-            # OCR failed, use original text
-            pass
-    
-    return text, False
-
-
-def extract_all_pages(pdf_file) -> tuple:
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        return [page.get_text("text") for page in pdf_document]
+
+
+def apply_ocr_fallback(pdf_bytes: bytes, page_texts: list) -> tuple:
     """
-    Extract text from all PDF pages with OCR support.
+    OCR the pages whose embedded text is too short (likely scanned images).
+    Pages are processed in parallel worker processes (OCR is CPU-bound); each
+    worker receives the PDF once and opens it once. Concurrent callers share the
+    cores by running one pool at a time. Pages with enough embedded text are left unchanged.
     
     Args:
-        pdf_file: Uploaded PDF file (Streamlit UploadedFile)
+        pdf_bytes: PDF file bytes
+        page_texts: Embedded text per page (from read_embedded_text)
     
     Returns:
         tuple: (pages_data: list[dict], ocr_used_pages: list[int])
     """
-    pdf_bytes = pdf_file.getvalue()
-    pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
+    page_texts = list(page_texts)
     
-    pages_data = []
-    ocr_used_pages = []
+    ocr_page_nums = []
+    if OCR_AVAILABLE:
+        ocr_page_nums = [
+            page_num for page_num, text in enumerate(page_texts)
+            if len(text.strip()) < OCR_MIN_TEXT_LENGTH
+        ]
     
-    for page_num in range(len(pdf_document)):
-        page = pdf_document[page_num]
-        page_text, used_ocr = extract_text_with_ocr(page, page_num, pdf_bytes)
-        
-        pages_data.append({
-            'page_num': page_num + 1,
-            'text': page_text
-        })
-        
-        if used_ocr:
+    if len(ocr_page_nums) > 1:
+        max_workers = min(len(ocr_page_nums), OCR_MAX_WORKERS)
+        # spawn rather than fork: forking the multi-threaded Streamlit process can deadlock
+        with _OCR_POOL_LOCK, ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_ocr_worker,
+            initargs=(pdf_bytes,),
+        ) as executor:
+            ocr_texts = list(executor.map(_ocr_worker_page, ocr_page_nums))
+    else:
+        ocr_texts = [ocr_page(pdf_bytes, page_num) for page_num in ocr_page_nums]
+    
+    ocr_used_pages = []
+    for page_num, ocr_text in zip(ocr_page_nums, ocr_texts):
+        if len(ocr_text.strip()) > len(page_texts[page_num].strip()):
+            page_texts[page_num] = ocr_text
             ocr_used_pages.append(page_num + 1)
     
-    pdf_document.close()
+    pages_data = [
+        {'page_num': page_num + 1, 'text': text}
+        for page_num, text in enumerate(page_texts)
+    ]
     
     return pages_data, ocr_used_pages
+
+
+def render_pages_to_jpeg(pdf_bytes: bytes, max_pages: int, zoom: float = 1.5) -> list:
+    """
+    Render the first pages of a PDF to JPEG images (for vision-model input).
+    
+    Args:
+        pdf_bytes: PDF file bytes
+        max_pages: Maximum number of pages to render
+        zoom: Render zoom factor (1.0 = 72 DPI)
+    
+    Returns:
+        list[bytes]: JPEG bytes per rendered page
+    """
+    pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
+    matrix = fitz.Matrix(zoom, zoom)
+    
+    images = []
+    for page_num in range(min(max_pages, len(pdf_document))):
+        pix = pdf_document[page_num].get_pixmap(matrix=matrix, alpha=False)
+        images.append(pix.tobytes("jpeg", jpg_quality=85))
+        pix = None
+    
+    pdf_document.close()
+    shrink_pdf_store()
+    
+    return images